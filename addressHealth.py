@@ -0,0 +1,128 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import time
+from collections import deque
+
+
+class Health:
+    """Состояние одного адреса."""
+
+    def __init__(self, size):
+        """Инициализация без измерений; size - размер окна задержек."""
+        self.latencies = deque(maxlen=size)
+        self.mean = None
+        self.deviation = 0.0
+        self.failures = 0
+        # Время, до которого адрес не опрашивается, и текущая задержка
+        # повторной проверки (0 - цепь замкнута).
+        self.openUntil = 0.0
+        self.backoff = 0.0
+
+
+class AddressHealth:
+    """Задержки ответов и доступность адресов модулей.
+
+    Время ожидания каждого адреса вычисляется по скользящему среднему
+    (EWMA) и 95-му процентилю задержек. После threshold ошибок подряд
+    адрес считается недоступным (цепь разомкнута) и не опрашивается;
+    проверочный запрос отправляется через backoff секунд, при новой
+    ошибке задержка удваивается до maxBackoff."""
+
+    def __init__(self, timeout=10, minTimeout=2, threshold=3,
+                 backoff=60, maxBackoff=3600, alpha=0.2, size=50):
+        """Инициализация:
+
+        timeout - максимальное (и начальное) время ожидания в секундах;
+
+        minTimeout - минимальное время ожидания в секундах;
+
+        threshold - количество ошибок подряд до размыкания цепи;
+
+        backoff, maxBackoff - начальная и максимальная задержка проверки
+        недоступного адреса в секундах;
+
+        alpha - коэффициент сглаживания EWMA;
+
+        size - количество последних задержек для процентиля."""
+        self.maxTimeout = timeout
+        self.minTimeout = minTimeout
+        self.threshold = threshold
+        self.initialBackoff = backoff
+        self.maxBackoff = maxBackoff
+        self.alpha = alpha
+        self.size = size
+        self.addresses = {}
+
+    def get(self, address):
+        """Состояние адреса, созданное при первом обращении."""
+        health = self.addresses.get(address)
+        if health is None:
+            health = Health(self.size)
+            self.addresses[address] = health
+        return health
+
+    def timeout(self, address):
+        """Время ожидания ответа адреса в секундах."""
+        health = self.addresses.get(address)
+        if health is None or health.mean is None:
+            return self.maxTimeout
+        latencies = sorted(health.latencies)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        timeout = max(3 * p95, health.mean + 4 * health.deviation)
+        return min(self.maxTimeout, max(self.minTimeout, timeout))
+
+    def split(self, addresses, now=None):
+        """Разделить адреса на опрашиваемые и пропускаемые
+        (цепь разомкнута и время проверки не наступило)."""
+        if now is None:
+            now = time.monotonic()
+        allowed = []
+        skipped = []
+        for address in addresses:
+            health = self.addresses.get(address)
+            if health is None or health.openUntil <= now:
+                allowed.append(address)
+            else:
+                skipped.append(address)
+        return allowed, skipped
+
+    def success(self, address, latency):
+        """Учесть успешный ответ с задержкой latency секунд."""
+        health = self.get(address)
+        health.latencies.append(latency)
+        if health.mean is None:
+            health.mean = latency
+            health.deviation = latency / 2
+        else:
+            error = latency - health.mean
+            health.mean += self.alpha * error
+            health.deviation += self.alpha * (abs(error) - health.deviation)
+        health.failures = 0
+        health.openUntil = 0.0
+        health.backoff = 0.0
+
+    def failure(self, address, now=None):
+        """Учесть ошибку запроса.
+
+        Возвращает задержку до проверочного запроса в секундах, если цепь
+        разомкнулась, иначе None."""
+        if now is None:
+            now = time.monotonic()
+        health = self.get(address)
+        health.failures += 1
+        if health.backoff:
+            # Проверочный запрос не удался.
+            health.backoff = min(2 * health.backoff, self.maxBackoff)
+        elif health.failures >= self.threshold:
+            health.backoff = self.initialBackoff
+        else:
+            return None
+        health.openUntil = now + health.backoff
+        return health.backoff
+
+    def isOpen(self, address):
+        """Проверить, разомкнута ли цепь адреса."""
+        health = self.addresses.get(address)
+        return health is not None and health.backoff > 0
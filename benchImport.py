@@ -0,0 +1,60 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import os
+import statistics
+import subprocess
+import sys
+
+# Модули, которые не должны загружаться при запуске программы.
+HEAVY = (
+    'matplotlib', 'pypdf', 'psutil', 'requests', 'smtplib',
+    'email.mime.multipart', 'concurrent.futures.process'
+)
+
+CODE = '''
+import sys, time
+begin = time.perf_counter()
+import {0}
+end = time.perf_counter()
+heavy = [name for name in {1!r} if name in sys.modules]
+print(end - begin, ' '.join(heavy))
+'''
+
+
+def measure(module, count):
+    """Измерить время импорта модуля module в count новых процессах.
+
+    Возвращает список времён в секундах и загруженные тяжёлые модули."""
+    times = []
+    heavy = ''
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for i in range(count):
+        output = subprocess.check_output(
+            [sys.executable, '-c', CODE.format(module, HEAVY)],
+            cwd=directory,
+            universal_newlines=True)
+        temp = output.strip().split(' ', 1)
+        times.append(float(temp[0]))
+        heavy = temp[1] if len(temp) > 1 else ''
+    return times, heavy
+
+
+if __name__ == '__main__':
+    # usage: benchImport [count] [module ...]
+    # Время импорта модулей программы (по умолчанию observer и mainWindow).
+    count = 5
+    modules = ['observer', 'mainWindow']
+    args = sys.argv[1:]
+    if args and args[0].isdigit():
+        count = int(args.pop(0))
+    if args:
+        modules = args
+    for module in modules:
+        times, heavy = measure(module, count)
+        print('{0}: median {1:.3f} s, min {2:.3f} s; heavy: {3}'.format(
+            module,
+            statistics.median(times),
+            min(times),
+            heavy or 'none'))
@@ -0,0 +1,344 @@
+# Original work Copyright © 2018 Stanislav Hnatiuk
+# Modified work Copyright 2018-2019 Oleksandr Bogomaz
+
+# !/usr/bin/env python3
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing
+import signal
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+
+import dayFile
+import rollup
+
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    # Без pypdf страницы нельзя объединить: рисование в одном потоке.
+    PdfWriter = None
+
+# Цвета линий графиков.
+COLORS = (
+    '#000000', '#0000AA', '#00AA00', '#00AAAA', '#AA0000',
+    '#AA00AA', '#AA5500', '#555555', '#5555FF', '#55FF55',
+    '#55FFFF', '#FF5555', '#FF55FF', '#FFFF55'
+)
+
+
+# Ширина области графика в точках: фигура 10 дюймов по 128 точек,
+# оси занимают 0.775 ширины.
+WIDTH = int(10 * 128 * 0.775)
+# Длина интервала свода, заполняющего ширину графика суток.
+RESOLUTION = rollup.choose(24 * 3600, WIDTH)
+
+
+class Page:
+    """Страница графиков: фигура и линии датчиков по осям."""
+
+    def __init__(self, figure, axes):
+        """Инициализация страницы с фигурой figure и списком осей axes."""
+        self.figure = figure
+        self.axes = axes
+        # Линии по осям: ключ датчика -> Line2D.
+        self.lines = [{} for ax in axes]
+        self.legend = False
+
+    def update(self, index, items, legend=False, autoscale=False):
+        """Обновить линии на осях index.
+
+        items - список (ключ, время, значения, подпись) в порядке
+        отрисовки."""
+        ax = self.axes[index]
+        lines = self.lines[index]
+        keys = [item[0] for item in items]
+        changed = False
+        for key in list(lines):
+            if key not in keys:
+                lines.pop(key).remove()
+                changed = True
+        for i, (key, times, values, label) in enumerate(items):
+            line = lines.get(key)
+            if line is None:
+                line, = ax.plot([], [], alpha=1)
+                lines[key] = line
+                changed = True
+            line.set_data(times, values)
+            line.set_color(COLORS[i % len(COLORS)])
+            if line.get_label() != label:
+                line.set_label(label)
+                changed = True
+        if autoscale:
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+        if legend and (changed or self.legend != bool(items)):
+            if ax.get_legend() is not None:
+                ax.get_legend().remove()
+            if items:
+                handles = [lines[key] for key in keys]
+                ax.legend(
+                    handles=handles,
+                    loc='upper center',
+                    bbox_to_anchor=(0.5, -0.1))
+            self.legend = bool(items)
+
+
+def axesSetup(ax, name, ylabel):
+    """Общие настройки осей графика суток."""
+    ax.set_title(name, loc='left')
+    ax.set_xticks(range(0, 25))
+    ax.set_xlim(0, 24)
+    ax.set_xlabel('Время')
+    ax.set_ylabel(ylabel)
+    ax.grid(True, which='major', color='grey')
+    ax.grid(True, which='minor', color='lightgrey')
+
+
+class ChartPages:
+    """Страницы графиков суток.
+
+    Фигуры и их оформление создаются один раз для суток, при следующих
+    отрисовках обновляются только данные линий."""
+
+    def __init__(self, name):
+        """Создать страницы графиков суток name."""
+        self.name = name
+
+        # График температур
+        figure = Figure(figsize=(10, 15), dpi=128)
+        ax = figure.add_subplot(111)
+        axesSetup(ax, name, '°C')
+        ax.set_title('Температура', fontsize=20)
+        figure.subplots_adjust(bottom=0.3)
+        self.temperature = Page(figure, [ax])
+
+        # Графики энергопотребления
+        figure = Figure(figsize=(10, 15), dpi=128)
+        figure.subplots_adjust(hspace=0.6)
+        axes = []
+        for i in range(6):
+            ax = figure.add_subplot(6, 1, i + 1)
+            axesSetup(ax, name, 'Вт')
+            ax.set_ylim(0, 2000)
+            axes.append(ax)
+        self.consumption = Page(figure, axes)
+
+        # График ресурсов компьютера
+        figure = Figure(figsize=(10, 15), dpi=128)
+        ax = figure.add_subplot(111)
+        axesSetup(ax, name, '%')
+        ax.set_title('Нагрузка', fontsize=20)
+        ax.set_yticks(range(0, 110, 10))
+        ax.set_ylim(0, 100)
+        figure.subplots_adjust(bottom=0.17)
+        self.resources = Page(figure, [ax])
+
+        self.pages = (self.temperature, self.consumption, self.resources)
+
+    def updatePage(self, index, items):
+        """Обновить данные страницы index.
+
+        Для страниц температур (0) и ресурсов (2) items - список
+        (ключ, время, значения, подпись), для страницы энергопотребления (1)
+        - шесть таких списков."""
+        if index == 1:
+            for i, panel in enumerate(items):
+                self.consumption.update(i, panel)
+                title = panel[-1][3] if panel else ''
+                self.consumption.axes[i].set_title(title, fontsize=10)
+        else:
+            self.pages[index].update(
+                0, items, legend=True, autoscale=(index == 0))
+
+    def update(self, items):
+        """Обновить данные всех страниц; items - данные страниц по порядку."""
+        for index, pageItems in enumerate(items):
+            self.updatePage(index, pageItems)
+
+    def savePage(self, index, path):
+        """Сохранить страницу index в отдельный PDF-файл path."""
+        with PdfPages(path) as pdf:
+            pdf.savefig(self.pages[index].figure)
+
+    def save(self, path):
+        """Сохранить страницы в PDF-файл path."""
+        with PdfPages(path) as pdf:
+            for page in self.pages:
+                pdf.savefig(page.figure)
+
+
+def prepare(series, names, date):
+    """Подготовить ряды датчиков для графиков.
+
+    series - словарь адрес -> (время, значения);
+
+    names - имена датчиков по адресам.
+
+    Если значений датчика больше, чем интервалов свода RESOLUTION
+    в сутках, рисуются средние по интервалам: точек больше, чем
+    по ширине графика, всё равно не видно.
+
+    Возвращает словарь ключ -> [часы, значения, подпись]; ключ - имя
+    датчика или адрес, если имени нет."""
+    sensors = {}
+    midnight = datetime(date.year, date.month, date.day).timestamp()
+    for address, (times, values) in series.items():
+        if len(address) < 4 or len(times) == 0:
+            continue
+        if RESOLUTION and len(times) > 24 * 3600 // RESOLUTION:
+            times, low, high, values, counts = rollup.reduce(
+                times, values, midnight, RESOLUTION)
+            times = times + RESOLUTION / 2
+        name = names.get(address, 'No name')
+        if name != 'No name':
+            description = '{} ({})'.format(name, address[-4:])
+        else:
+            name = address
+            description = address
+        hours = (times - midnight) / 3600
+        # Добавление пропуска если нет данных в течении пяти минут.
+        breaks = np.flatnonzero(np.diff(hours) > 5.0/60.0) + 1
+        hours = np.insert(hours, breaks, hours[breaks] - 0.08)
+        values = np.insert(values, breaks, np.nan)
+        sensors[name] = [hours, values, description]
+    return sensors
+
+
+def select(sensors, config):
+    """Распределить датчики по страницам графиков.
+
+    config - настройки датчиков (sensorConfig.SensorConfig)."""
+    keys = sorted(sensors)
+
+    # Датчики графика температур.
+    group = config.group('temperature')
+    temperature = [(key, *sensors[key]) for key in keys if key in group]
+
+    # Датчики графиков энергопотребления: номер графика - строка файла.
+    consumption = [[] for i in range(6)]
+    for key in keys:
+        i = config.panels.get(key)
+        if i is not None and i < len(consumption):
+            consumption[i].append((key, *sensors[key]))
+
+    # Датчики графика ресурсов.
+    group = config.group('resources')
+    resources = [(key, *sensors[key]) for key in keys if key in group]
+
+    return temperature, consumption, resources
+
+
+# Страницы графиков, построенные в процессе пула, по суткам.
+processPages = {}
+
+
+def renderPage(name, index, items, path):
+    """Нарисовать страницу index графиков суток name в файл path.
+
+    Выполняется в процессе пула; оформление страниц сохраняется
+    в процессе между вызовами."""
+    pages = processPages.get(name)
+    if pages is None:
+        processPages.clear()
+        pages = ChartPages(name)
+        processPages[name] = pages
+    pages.updatePage(index, items)
+    pages.savePage(index, path)
+    return path
+
+
+def renderDay(pathData, date, config):
+    """Нарисовать все страницы графиков суток date в файл Y.M.D.pdf.
+
+    Выполняется в процессе пула при построении графиков за прошлые сутки.
+    Если у суток есть свод RESOLUTION, читается он, а не все значения."""
+    base = dayFile.path(pathData, date)
+    if RESOLUTION and rollup.has(base, RESOLUTION):
+        series, names = rollup.read(base, RESOLUTION)
+        series = {
+            address: (item[0] + RESOLUTION / 2, item[3])
+            for address, item in series.items()
+        }
+    else:
+        series, names = dayFile.read(pathData, date)
+    if not series:
+        return None
+    pages = ChartPages(date.strftime('%Y.%m.%d'))
+    pages.update(select(prepare(series, names, date), config))
+    pages.save(base + '.pdf')
+    return base + '.pdf'
+
+
+def merge(paths, path):
+    """Объединить PDF-файлы paths в файл path и удалить их."""
+    writer = PdfWriter()
+    for item in paths:
+        writer.append(item)
+    with open(path, 'wb') as file:
+        writer.write(file)
+    for item in paths:
+        os.remove(item)
+
+
+def ignoreInterrupt():
+    """Игнорировать Ctrl+C в процессе пула: прерывание обрабатывает
+    главный процесс, который и завершает пул."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def executor(workers=None):
+    """Создать пул процессов рисования графиков."""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=ignoreInterrupt)
+
+
+def backfill(pathData, dates, config, workers=None):
+    """Нарисовать параллельно недостающие графики суток dates
+    (у которых нет файла Y.M.D.pdf).
+
+    Возвращает список сохранённых файлов."""
+    dates = [
+        date for date in dates
+        if not os.path.exists(dayFile.path(pathData, date) + '.pdf')
+    ]
+    if not dates:
+        return []
+    with executor(workers) as pool:
+        futures = [
+            pool.submit(renderDay, pathData, date, config)
+            for date in dates
+        ]
+        return [path for path in (f.result() for f in futures) if path]
+
+
+if __name__ == '__main__':
+    # usage: chartPages pathData pathSensors Y.M.D [Y.M.D]
+    # Нарисовать недостающие графики прошлых суток с первой даты
+    # по вторую (по вчерашние сутки, если она не задана).
+    import sys
+    from datetime import timedelta
+    import sensorConfig
+
+    args = sys.argv[1:]
+    if len(args) not in (3, 4):
+        raise SystemExit(
+            'usage: chartPages pathData pathSensors Y.M.D [Y.M.D]')
+    try:
+        first = datetime.strptime(args[2], '%Y.%m.%d')
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        last = today - timedelta(days=1)
+        if len(args) > 3:
+            last = min(last, datetime.strptime(args[3], '%Y.%m.%d'))
+    except ValueError as e:
+        raise SystemExit(e)
+    dates = [
+        first + timedelta(days=number)
+        for number in range((last - first).days + 1)
+    ]
+    for path in backfill(args[0], dates, sensorConfig.load(args[1])):
+        print(path)
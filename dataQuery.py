@@ -0,0 +1,242 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import os
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+
+import dayFile
+import rollup
+
+
+def days(start, end):
+    """Перебрать даты суток, покрывающих интервал [start, end)."""
+    date = datetime(start.year, start.month, start.day)
+    while date < end:
+        yield date
+        date += timedelta(days=1)
+
+
+class Result:
+    """Накопление частей рядов датчиков.
+
+    Без resolution части хранятся как есть. С resolution значения
+    каждой части сразу сводятся в интервалы по resolution секунд
+    (сумма и количество), поэтому память зависит от размера результата,
+    а не от объёма прочитанных файлов."""
+
+    def __init__(self, start, resolution=None):
+        """Инициализация: start - начало интервала в секундах эпохи."""
+        self.start = start
+        self.resolution = resolution
+        self.parts = {}
+        self.names = {}
+
+    def add(self, address, name, times, values, counts=None):
+        """Добавить значения датчика address.
+
+        counts - количества значений, если values - средние сводов."""
+        if len(times) == 0:
+            return
+        self.names.setdefault(address, name)
+        if self.resolution:
+            buckets = ((times - self.start) // self.resolution).astype(
+                np.int64)
+            valid = ~np.isnan(values)
+            buckets = buckets[valid]
+            values = values[valid]
+            if len(buckets) == 0:
+                return
+            if counts is None:
+                counts = np.ones(len(buckets))
+            else:
+                counts = counts[valid].astype(np.float64)
+            first = buckets.min()
+            sums = np.bincount(buckets - first, values * counts)
+            counts = np.bincount(buckets - first, counts)
+            used = np.flatnonzero(counts)
+            part = (used + first, sums[used], counts[used])
+        else:
+            part = (times, values)
+        self.parts.setdefault(address, []).append(part)
+
+    def series(self):
+        """Вернуть словарь адрес -> (время, значения), упорядоченные
+        по времени. Со сводом время - начало интервала, значение -
+        среднее."""
+        series = {}
+        for address, parts in self.parts.items():
+            if self.resolution:
+                buckets = np.concatenate([part[0] for part in parts])
+                sums = np.concatenate([part[1] for part in parts])
+                counts = np.concatenate([part[2] for part in parts])
+                # Интервалы на границах частей встречаются несколько раз.
+                buckets, inverse = np.unique(buckets, return_inverse=True)
+                inverse = inverse.reshape(-1)
+                sums = np.bincount(inverse, sums)
+                counts = np.bincount(inverse, counts)
+                times = self.start + buckets * self.resolution
+                values = sums / counts
+            else:
+                times = np.concatenate([part[0] for part in parts])
+                values = np.concatenate([part[1] for part in parts])
+                if np.any(np.diff(times) < 0):
+                    order = np.argsort(times, kind='stable')
+                    times = times[order]
+                    values = values[order]
+            series[address] = (times, values)
+        return series
+
+
+def readBinary(result, base, wanted, start, end, block):
+    """Добавить в result записи двоичного файла суток base
+    блоками по block записей."""
+    records, ids = dayFile.readBinary(base)
+    numbers = np.array([
+        wanted is None or address in wanted for address, name in ids
+    ], dtype=bool)
+    if not numbers.any():
+        return
+    for i in range(0, len(records), block):
+        chunk = np.asarray(records[i:i + block])
+        chunk = chunk[chunk['id'] < len(ids)]
+        times = chunk['time']
+        chunk = chunk[
+            numbers[chunk['id']] & (times >= start) & (times < end)]
+        series, names = dayFile.group(chunk, ids)
+        for address, (times, values) in series.items():
+            result.add(address, names[address], times, values)
+
+
+def readRollup(result, base, level, wanted, start, end):
+    """Добавить в result свод суток base с интервалом level секунд."""
+    series, names = rollup.read(base, level)
+    for address, (times, low, high, means, counts) in series.items():
+        if wanted is not None and address not in wanted:
+            continue
+        mask = (times >= start) & (times < end)
+        result.add(
+            address, names[address], times[mask], means[mask], counts[mask])
+
+
+def level(start, end, resolution):
+    """Выбрать свод, из которого можно получить интервалы resolution
+    секунд: самый грубый, на интервалы которого делятся resolution
+    и границы start, end (от начала суток). None - свода нет."""
+    midnight = datetime(start.year, start.month, start.day)
+    offset = (start - midnight).total_seconds()
+    span = (end - start).total_seconds()
+    result = None
+    for item in rollup.RESOLUTIONS:
+        if resolution % item == 0 and offset % item == 0 and \
+                span % item == 0:
+            result = item
+    return result
+
+
+def readCsv(result, path, date, wanted, start, end, block):
+    """Добавить в result строки текстового файла суток path,
+    читая его блоками по block байт."""
+    midnight = date.timestamp()
+
+    def add(data):
+        series, names = dayFile.parseCsv(data, midnight)
+        for address, (times, values) in series.items():
+            if wanted is not None and address not in wanted:
+                continue
+            mask = (times >= start) & (times < end)
+            result.add(address, names[address], times[mask], values[mask])
+
+    with open(path, 'rb') as file:
+        tail = b''
+        while True:
+            data = file.read(block)
+            if not data:
+                break
+            data = tail + data
+            # Незавершённая строка переносится в следующий блок.
+            cut = data.rfind(b'\n') + 1
+            tail = data[cut:]
+            add(data[:cut])
+    # Последняя строка файла без перевода строки.
+    if tail:
+        add(tail)
+
+
+def query(pathData, sensors, start, end, resolution=None, block=1 << 20,
+          width=None):
+    """Прочитать показания датчиков за интервал [start, end).
+
+    pathData - папка данных (файлы Y\\M\\D\\Y.M.D.*, как их пишет
+    Observer);
+
+    sensors - адреса датчиков, None - все датчики;
+
+    start, end - границы интервала (datetime);
+
+    resolution - длина интервала свода в секундах: значения сводятся
+    в средние по интервалам, None - значения без свода;
+
+    block - размер блока чтения (записей двоичного файла или байт
+    текстового);
+
+    width - количество точек по ширине графика: если resolution
+    не задан, выбирается самый грубый свод, который заполняет ширину.
+
+    Для прошедших суток, у которых есть подходящий свод (rollup), читается
+    свод. Иначе читается двоичный файл суток, если он есть, или
+    текстовый; файлы читаются блоками и в память целиком не загружаются.
+    Возвращает словари адрес -> (время, значения) и адрес -> имя."""
+    if resolution is None and width:
+        resolution = rollup.choose((end - start).total_seconds(), width)
+    wanted = None if sensors is None else set(sensors)
+    begin = start.timestamp()
+    finish = end.timestamp()
+    result = Result(begin, resolution)
+    levelRollup = level(start, end, resolution) if resolution else None
+    # Своды текущих суток ещё не завершены.
+    today = datetime.now().date()
+    for date in days(start, end):
+        base = dayFile.path(pathData, date)
+        if levelRollup and date.date() < today and \
+                rollup.has(base, levelRollup):
+            readRollup(result, base, levelRollup, wanted, begin, finish)
+        elif dayFile.hasBinary(base):
+            readBinary(result, base, wanted, begin, finish, block)
+        elif os.path.exists(base + '.csv'):
+            readCsv(
+                result, base + '.csv', date, wanted, begin, finish, block)
+    return result.series(), result.names
+
+
+if __name__ == '__main__':
+    # usage: dataQuery pathData Y.M.D[-H:M] Y.M.D[-H:M] [resolution]
+    #                  [address ...]
+    # Вывести показания датчиков за интервал строками 'время;адрес;значение'.
+    def parse(text):
+        for form in ('%Y.%m.%d-%H:%M', '%Y.%m.%d'):
+            try:
+                return datetime.strptime(text, form)
+            except ValueError:
+                pass
+        raise SystemExit('Wrong date: {}'.format(text))
+
+    args = sys.argv[1:]
+    if len(args) < 3:
+        raise SystemExit(
+            'usage: dataQuery pathData Y.M.D[-H:M] Y.M.D[-H:M] '
+            '[resolution] [address ...]')
+    resolution = None
+    if len(args) > 3 and args[3].isdigit():
+        resolution = int(args.pop(3))
+    series, names = query(
+        args[0], args[3:] or None, parse(args[1]), parse(args[2]),
+        resolution)
+    for address in sorted(series):
+        for time, value in zip(*series[address]):
+            print('{};{};{}'.format(
+                datetime.fromtimestamp(time).strftime('%Y.%m.%d %H:%M:%S'),
+                address,
+                value))
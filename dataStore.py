@@ -0,0 +1,112 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import numpy as np
+
+import dayFile
+
+
+class Series:
+    """Временной ряд одного датчика: массивы времени (секунды эпохи)
+    и значений, выделяемые блоками."""
+
+    def __init__(self, chunk=1024):
+        """Инициализация ряда с блоком выделения chunk значений."""
+        self.chunk = chunk
+        self.times = np.empty(chunk, dtype=np.float64)
+        self.values = np.empty(chunk, dtype=np.float64)
+        self.count = 0
+
+    def grow(self, size):
+        """Увеличить массивы так, чтобы в них поместилось size значений."""
+        size = (size // self.chunk + 1) * self.chunk
+        times = np.empty(size, dtype=np.float64)
+        values = np.empty(size, dtype=np.float64)
+        times[:self.count] = self.times[:self.count]
+        values[:self.count] = self.values[:self.count]
+        self.times = times
+        self.values = values
+
+    def append(self, time, value):
+        """Добавить значение."""
+        if self.count == len(self.times):
+            self.grow(self.count + 1)
+        self.times[self.count] = time
+        self.values[self.count] = value
+        self.count += 1
+
+    def extend(self, times, values):
+        """Добавить массивы значений."""
+        size = self.count + len(times)
+        if size > len(self.times):
+            self.grow(size)
+        self.times[self.count:size] = times
+        self.values[self.count:size] = values
+        self.count = size
+
+    def data(self):
+        """Вернуть массивы времени и значений.
+
+        Возвращаются представления заполненной части массивов: добавление
+        новых значений их не меняет, поэтому их можно передавать
+        в другие потоки."""
+        return self.times[:self.count], self.values[:self.count]
+
+    def last(self):
+        """Вернуть последнее значение."""
+        if self.count:
+            return self.values[self.count - 1]
+        return None
+
+    def range(self):
+        """Вернуть минимальное и максимальное значения (без пропусков)."""
+        values = self.values[:self.count]
+        values = values[~np.isnan(values)]
+        if len(values):
+            return values.min(), values.max()
+        return None
+
+    def gaps(self, interval):
+        """Вернуть индексы значений, перед которыми нет данных дольше
+        interval секунд."""
+        return np.flatnonzero(np.diff(self.times[:self.count]) > interval) + 1
+
+
+class DataStore:
+    """Хранилище показаний датчиков за текущие сутки."""
+
+    def __init__(self):
+        """Инициализация пустого хранилища."""
+        self.date = None
+        self.series = {}
+
+    def reset(self, date):
+        """Очистить хранилище и начать сутки date."""
+        self.date = date.date()
+        self.series = {}
+
+    def append(self, address, time, value):
+        """Добавить значение value датчика address во время time
+        (секунды эпохи)."""
+        series = self.series.get(address)
+        if series is None:
+            series = Series()
+            self.series[address] = series
+        series.append(time, value)
+
+    def snapshot(self):
+        """Вернуть словарь адрес -> (время, значения) для чтения
+        в другом потоке."""
+        return {
+            address: series.data()
+            for address, series in self.series.items()
+        }
+
+    def load(self, pathData, date):
+        """Начать сутки date, загрузив их данные из папки pathData."""
+        self.reset(date)
+        series, names = dayFile.read(pathData, date)
+        for address, (times, values) in series.items():
+            self.series[address] = Series()
+            self.series[address].extend(times, values)
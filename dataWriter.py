@@ -0,0 +1,264 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import os
+import time
+from datetime import datetime
+import numpy as np
+
+import dayFile
+import rollup
+
+
+def readSize(base):
+    """Размер текстового файла, по которому построен двоичный файл
+    суток base, или None, если он неизвестен."""
+    try:
+        with open(base + '.bsize', 'r') as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        return None
+
+
+class DayFiles:
+    """Открытые файлы одних суток и их буферы.
+
+    Кроме текстового файла Y.M.D.csv может вестись двоичный Y.M.D.bin
+    со словарём датчиков Y.M.D.ids; в Y.M.D.bsize записывается размер
+    текстового файла, которому соответствует двоичный. Одновременно
+    обновляются своды суток (rollup.Rollups)."""
+
+    def __init__(self, pathData, date, binary):
+        """Открыть файлы суток date в папке pathData для добавления;
+        binary - вести двоичный файл суток."""
+        self.binary = binary
+        self.file = None
+        self.fileBinary = None
+        self.fileIds = None
+        self.ids = {}
+        self.rows = []
+        self.records = []
+        self.newIds = []
+        # В файлы добавлялись данные после предыдущей записи буфера.
+        self.used = False
+        self.rollups = rollup.Rollups()
+        self.base = dayFile.path(pathData, date)
+        try:
+            self.open(date)
+        except BaseException:
+            self.close()
+            raise
+
+    def open(self, date):
+        """Открыть файлы суток для добавления.
+
+        Текстовый файл разбирается, только если двоичный файл или своды
+        отстают от него и строятся заново."""
+        base = self.base
+        directory = base[:base.rfind('\\')]
+        if not os.path.exists(directory):
+            os.makedirs(directory, 0o777, True)
+        self.file = open(base + '.csv', 'a')
+        size = self.file.tell()
+        current = not self.binary or (
+            os.path.exists(base + '.ids') and
+            os.path.exists(base + '.bin') and
+            readSize(base) == size)
+        series = names = None
+        if size and not (current and rollup.complete(base)):
+            series, names = dayFile.readCsv(base + '.csv', date)
+        if self.binary:
+            self.openBinary(current, series, names)
+        self.rollups.open(
+            base,
+            datetime(date.year, date.month, date.day).timestamp(),
+            size == 0, series, names)
+
+    def openBinary(self, current, series=None, names=None):
+        """Открыть двоичный файл суток и его словарь датчиков.
+
+        current - двоичный файл построен по текстовому файлу текущего
+        размера; иначе (двоичный файл не вёлся часть суток или запись
+        прервалась) он строится заново из данных текстового series,
+        names."""
+        base = self.base
+        if current:
+            for address, name in dayFile.readIds(base + '.ids'):
+                self.ids[address] = len(self.ids)
+            self.fileBinary = open(base + '.bin', 'ab')
+            # Отбросить незавершённую запись.
+            size = self.fileBinary.tell()
+            if size % dayFile.RECORD.itemsize:
+                self.fileBinary.truncate(
+                    size - size % dayFile.RECORD.itemsize)
+            self.fileIds = open(base + '.ids', 'a', encoding='utf-8')
+            return
+        self.fileBinary = open(base + '.bin', 'wb')
+        if series:
+            self.rebuild(series, names)
+        self.fileIds = open(base + '.ids', 'w', encoding='utf-8')
+        if self.newIds:
+            self.fileIds.write(''.join(self.newIds))
+            self.newIds.clear()
+            self.fileIds.flush()
+        self.writeSize()
+
+    def writeSize(self):
+        """Записать размер текстового файла, которому соответствует
+        двоичный."""
+        with open(self.base + '.bsize', 'w') as file:
+            file.write('{}\n'.format(os.fstat(self.file.fileno()).st_size))
+
+    def rebuild(self, series, names):
+        """Записать в новый двоичный файл данные текстового файла."""
+        parts = []
+        for address, (times, values) in series.items():
+            number = len(self.ids)
+            self.ids[address] = number
+            self.newIds.append('{};{}\n'.format(address, names[address]))
+            part = np.empty(len(times), dtype=dayFile.RECORD)
+            part['time'] = times
+            part['id'] = number
+            part['value'] = values
+            parts.append(part)
+        records = np.concatenate(parts)
+        records = records[np.argsort(records['time'], kind='stable')]
+        self.fileBinary.write(records.tobytes())
+        self.fileBinary.flush()
+
+    def write(self, date, rows):
+        """Добавить в буфер строки rows, полученные во время date."""
+        self.used = True
+        timeStr = date.strftime('%H:%M:%S')
+        stamp = date.timestamp()
+        for address, name, text, value in rows:
+            self.rows.append(
+                '{0};{1};{2};{3}\n'.format(timeStr, address, name, text))
+            self.rollups.add(address, name, stamp, value)
+            if self.fileBinary is not None:
+                number = self.ids.get(address)
+                if number is None:
+                    number = len(self.ids)
+                    self.ids[address] = number
+                    self.newIds.append('{};{}\n'.format(address, name))
+                self.records.append((stamp, number, value))
+
+    def flush(self):
+        """Записать буфер в файлы."""
+        self.used = False
+        if self.newIds:
+            self.fileIds.write(''.join(self.newIds))
+            self.newIds.clear()
+            self.fileIds.flush()
+        written = bool(self.rows)
+        if self.rows:
+            rows = ''.join(self.rows)
+            self.rows.clear()
+            self.file.write(rows)
+        if self.file is not None:
+            self.file.flush()
+        if self.records:
+            records = np.array(self.records, dtype=dayFile.RECORD)
+            self.records.clear()
+            self.fileBinary.write(records.tobytes())
+        if self.fileBinary is not None:
+            self.fileBinary.flush()
+            if written:
+                self.writeSize()
+        self.rollups.flush()
+
+    def close(self):
+        """Записать буфер и закрыть файлы."""
+        try:
+            self.flush()
+        finally:
+            self.rollups.close()
+            for file in (self.file, self.fileBinary, self.fileIds):
+                if file is not None:
+                    file.close()
+            self.file = None
+            self.fileBinary = None
+            self.fileIds = None
+
+
+class DataWriter:
+    """Буферизованная запись данных в файлы суток.
+
+    Файлы остаются открытыми, строки накапливаются в буфере и записываются
+    одним вызовом в конце раунда опроса, при переполнении буфера
+    или по истечении времени. Открытыми остаются файлы последних maxDays
+    суток, поэтому ответы на запросы, отправленные до полуночи, не
+    закрывают файлы новых суток; файлы прошлых суток, в которые ничего
+    не добавилось с предыдущей записи буфера, закрываются."""
+
+    def __init__(self, maxRows=10000, maxDelay=30, binary=True, maxDays=2):
+        """Инициализация:
+
+        maxRows - количество строк в буфере, при котором он записывается;
+
+        maxDelay - максимальное время хранения строк в буфере в секундах;
+
+        binary - вести двоичный файл суток;
+
+        maxDays - сколько суток держать файлы открытыми."""
+        self.maxRows = maxRows
+        self.maxDelay = maxDelay
+        self.binary = binary
+        self.maxDays = maxDays
+        # (папка данных, дата) -> DayFiles.
+        self.days = {}
+        self.count = 0
+        self.first = None
+
+    def write(self, pathData, date, rows):
+        """Добавить данные в буфер файлов суток date в папке pathData.
+
+        rows - список кортежей (адрес, имя, значение строкой, значение)."""
+        key = (pathData, date.date())
+        day = self.days.get(key)
+        if day is not None and day.binary != self.binary:
+            del self.days[key]
+            day.close()
+            day = None
+        if day is None:
+            day = DayFiles(pathData, date, self.binary)
+            self.days[key] = day
+            if len(self.days) > self.maxDays:
+                # Закрыть файлы самых ранних из остальных суток.
+                oldest = min(
+                    (item for item in self.days if item != key),
+                    key=lambda item: item[1])
+                self.days.pop(oldest).close()
+        if not self.count:
+            self.first = time.monotonic()
+        day.write(date, rows)
+        self.count += len(rows)
+        if (self.count >= self.maxRows or
+                time.monotonic() - self.first >= self.maxDelay):
+            self.flush()
+
+    def flush(self):
+        """Записать буферы в файлы."""
+        self.count = 0
+        latest = max((key[1] for key in self.days), default=None)
+        for key, day in list(self.days.items()):
+            if day.used or key[1] == latest:
+                day.flush()
+            else:
+                del self.days[key]
+                day.close()
+
+    def close(self):
+        """Записать буферы и закрыть файлы (остановка)."""
+        self.count = 0
+        days = list(self.days.values())
+        self.days.clear()
+        error = None
+        for day in days:
+            try:
+                day.close()
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
@@ -0,0 +1,193 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import locale
+import os
+from datetime import datetime
+import numpy as np
+
+# Запись двоичного файла суток Y.M.D.bin: время (секунды эпохи),
+# номер датчика в словаре Y.M.D.ids и значение.
+RECORD = np.dtype([('time', '<f8'), ('id', '<u4'), ('value', '<f8')])
+
+
+def path(pathData, date):
+    """Вернуть путь к файлам суток date без расширения."""
+    return '{0}\\{1}\\{2}\\{3}\\{4}'.format(
+        pathData,
+        date.strftime('%Y'),
+        date.strftime('%m'),
+        date.strftime('%d'),
+        date.strftime('%Y.%m.%d'))
+
+
+def readIds(path):
+    """Считать словарь датчиков двоичного файла: список (адрес, имя)."""
+    ids = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            temp = line.replace('\n', '').split(';', 1)
+            if len(temp) == 2:
+                ids.append((temp[0], temp[1]))
+    return ids
+
+
+def hasBinary(base):
+    """Проверить, есть ли у суток актуальный двоичный файл.
+
+    Двоичный файл записывается после текстового; если текстовый новее,
+    двоичный файл в какой-то момент не вёлся."""
+    if not (os.path.exists(base + '.bin') and os.path.exists(base + '.ids')):
+        return False
+    if not os.path.exists(base + '.csv'):
+        return True
+    return os.path.getmtime(base + '.bin') >= os.path.getmtime(base + '.csv')
+
+
+def readBinary(base):
+    """Отобразить в память двоичный файл суток.
+
+    Возвращает массив записей RECORD и словарь датчиков.
+    Незавершённая последняя запись отбрасывается."""
+    ids = readIds(base + '.ids')
+    count = os.path.getsize(base + '.bin') // RECORD.itemsize
+    if count == 0:
+        return np.empty(0, dtype=RECORD), ids
+    records = np.memmap(base + '.bin', dtype=RECORD, mode='r', shape=(count,))
+    return records, ids
+
+
+def group(records, ids):
+    """Разделить записи по датчикам.
+
+    Возвращает словари адрес -> (время, значения) и адрес -> имя."""
+    series = {}
+    names = {}
+    if len(records) == 0:
+        return series, names
+    numbers = np.asarray(records['id'])
+    order = np.argsort(numbers, kind='stable')
+    bounds = np.flatnonzero(np.diff(numbers[order])) + 1
+    for chunk in np.split(order, bounds):
+        number = numbers[chunk[0]]
+        if number >= len(ids):
+            continue
+        address, name = ids[number]
+        series[address] = (records['time'][chunk], records['value'][chunk])
+        names[address] = name
+    return series, names
+
+
+def seconds(column):
+    """Перевести столбец времени b'HH:MM:SS' в секунды от начала суток.
+
+    Возвращает секунды и маску правильных значений."""
+    valid = np.char.str_len(column) == 8
+    codes = np.frombuffer(
+        column.astype('S8').tobytes(), dtype=np.uint8
+    ).reshape(-1, 8).astype(np.int32) - ord('0')
+    digits = codes[:, [0, 1, 3, 4, 6, 7]]
+    valid &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    valid &= (codes[:, 2] == ord(':') - ord('0')) & \
+        (codes[:, 5] == ord(':') - ord('0'))
+    result = (codes[:, 0] * 10 + codes[:, 1]) * 3600 + \
+        (codes[:, 3] * 10 + codes[:, 4]) * 60 + \
+        codes[:, 6] * 10 + codes[:, 7]
+    return result, valid
+
+
+def values(column):
+    """Перевести столбец значений в числа; ошибочные значения - NaN."""
+    try:
+        return column.astype(np.float64)
+    except ValueError:
+        pass
+    # Преобразовать каждое различное значение один раз.
+    unique, inverse = np.unique(column, return_inverse=True)
+    result = np.empty(len(unique), dtype=np.float64)
+    for i, value in enumerate(unique):
+        try:
+            result[i] = float(value)
+        except ValueError:
+            result[i] = np.nan
+    return result[inverse.reshape(-1)]
+
+
+def parseCsv(data, midnight, encoding=None):
+    """Разобрать строки текстового файла суток.
+
+    data - содержимое файла (bytes) из целых строк;
+
+    midnight - начало суток в секундах эпохи.
+
+    Возвращает словари адрес -> (время, значения) и адрес -> имя."""
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    series = {}
+    result = {}
+    data = data.replace(b'\r', b'')
+    if not data.strip():
+        return series, result
+    fields = data.replace(b'\n', b';').split(b';')
+    if fields[-1] == b'':
+        fields.pop()
+    columns = None
+    if len(fields) % 4 == 0:
+        columns = [np.array(fields[i::4]) for i in (0, 1, 3)]
+        names = fields[2::4]
+        times, valid = seconds(columns[0])
+        if not valid.all():
+            columns = None
+    if columns is None:
+        # Есть строки с неверным количеством полей: разбор построчно.
+        rows = [line.split(b';') for line in data.split(b'\n')]
+        rows = [row for row in rows if len(row) == 4]
+        if not rows:
+            return series, result
+        columns = [np.array([row[i] for row in rows]) for i in (0, 1, 3)]
+        names = [row[2] for row in rows]
+        times, valid = seconds(columns[0])
+        if not valid.all():
+            columns = [column[valid] for column in columns]
+            names = [name for name, ok in zip(names, valid) if ok]
+            times = times[valid]
+
+    if len(times) == 0:
+        return series, result
+    times = times + midnight
+    addresses, first, inverse = np.unique(
+        columns[1], return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.cumsum(np.bincount(inverse))[:-1]
+    numbers = values(columns[2])
+    for i, chunk in enumerate(np.split(order, bounds)):
+        address = addresses[i].decode(encoding)
+        series[address] = (times[chunk], numbers[chunk])
+        result[address] = names[first[i]].decode(encoding)
+    return series, result
+
+
+def readCsv(path, date):
+    """Считать текстовый файл суток.
+
+    Возвращает словари адрес -> (время, значения) и адрес -> имя."""
+    midnight = datetime(date.year, date.month, date.day).timestamp()
+    with open(path, 'rb') as file:
+        data = file.read()
+    # Незавершённая последняя строка не разбирается.
+    return parseCsv(data[:data.rfind(b'\n') + 1], midnight)
+
+
+def read(pathData, date):
+    """Считать данные суток из двоичного файла, если он есть,
+    иначе из текстового.
+
+    Возвращает словари адрес -> (время, значения) и адрес -> имя."""
+    base = path(pathData, date)
+    if hasBinary(base):
+        return group(*readBinary(base))
+    if os.path.exists(base + '.csv'):
+        return readCsv(base + '.csv', date)
+    return {}, {}
@@ -0,0 +1,279 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+# Выбор реализации QtCore для ядра программы.
+#
+# При запуске с ключом --headless (или с переменной окружения
+# OBSERVER_HEADLESS=1) вместо PyQt5 используется этот модуль: в нём есть
+# минимальные замены сигналов, QObject, QThread, QTimer и цикла событий,
+# которых достаточно ядру. Модули ядра импортируют QtCore отсюда:
+# from headless import QtCore.
+
+import heapq
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+
+enabled = '--headless' in sys.argv or \
+    os.environ.get('OBSERVER_HEADLESS', '') not in ('', '0')
+if enabled:
+    # Процессы пула рисования графиков тоже работают без PyQt5.
+    os.environ['OBSERVER_HEADLESS'] = '1'
+
+
+class Qt:
+    """Константы Qt, используемые ядром."""
+    AutoConnection = 0
+    DirectConnection = 1
+    QueuedConnection = 2
+    PreciseTimer = 0
+    CoarseTimer = 1
+
+
+class BoundSignal:
+    """Сигнал объекта: список подключённых слотов."""
+
+    def __init__(self):
+        """Инициализация сигнала без слотов."""
+        self.slots = []
+
+    def connect(self, slot, type=Qt.AutoConnection):
+        """Подключить слот slot."""
+        self.slots.append((slot, type))
+
+    def disconnect(self, slot=None):
+        """Отключить слот slot или все слоты."""
+        self.slots = [
+            item for item in self.slots
+            if slot is not None and item[0] != slot
+        ]
+
+    def emit(self, *args):
+        """Вызвать слоты.
+
+        Слоты вызываются сразу, если сигнал отправлен из потока цикла
+        событий и подключение не отложенное; иначе вызов передаётся
+        в цикл событий."""
+        app = QCoreApplication.instance()
+        for slot, type in list(self.slots):
+            if app is None or type == Qt.DirectConnection or (
+                    type != Qt.QueuedConnection and app.isCurrent()):
+                slot(*args)
+            else:
+                app.post(slot, args)
+
+
+class pyqtSignal:
+    """Описание сигнала класса (аналог QtCore.pyqtSignal)."""
+
+    def __init__(self, *types):
+        """Инициализация сигнала с типами аргументов types."""
+        self.types = types
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        signal = instance.__dict__.get(self.name)
+        if signal is None:
+            signal = BoundSignal()
+            instance.__dict__[self.name] = signal
+        return signal
+
+
+class QObject:
+    """Базовый объект."""
+
+    def __init__(self, parent=None):
+        """Инициализация объекта."""
+        self.parent = parent
+
+
+class QCoreApplication:
+    """Цикл событий: отложенные вызовы слотов и таймеры."""
+    current = None
+
+    def __init__(self, argv=None):
+        """Инициализация цикла событий."""
+        self.calls = queue.Queue()
+        self.timers = []
+        self.counter = itertools.count()
+        self.thread = threading.current_thread()
+        self.code = None
+        QCoreApplication.current = self
+
+    @staticmethod
+    def instance():
+        """Текущий цикл событий."""
+        return QCoreApplication.current
+
+    def isCurrent(self):
+        """Проверить, выполняется ли код в потоке цикла событий."""
+        return threading.current_thread() is self.thread
+
+    def post(self, slot, args):
+        """Передать вызов слота в цикл событий."""
+        self.calls.put((slot, args))
+
+    def schedule(self, timer, deadline):
+        """Запланировать срабатывание таймера."""
+        heapq.heappush(
+            self.timers, (deadline, next(self.counter), timer, timer.serial))
+        # Разбудить цикл, если он ждёт в другом потоке.
+        if not self.isCurrent():
+            self.calls.put(None)
+
+    def exec(self):
+        """Выполнять цикл событий до вызова quit."""
+        self.code = None
+        while self.code is None:
+            now = time.monotonic()
+            while self.timers and self.timers[0][0] <= now:
+                deadline, number, timer, serial = heapq.heappop(self.timers)
+                if timer.serial == serial and timer.active:
+                    timer.fire(deadline)
+            timeout = None
+            if self.timers:
+                timeout = max(0, self.timers[0][0] - time.monotonic())
+            try:
+                call = self.calls.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if call is not None:
+                slot, args = call
+                slot(*args)
+        return self.code
+
+    exec_ = exec
+
+    def quit(self):
+        """Завершить цикл событий."""
+        self.exit(0)
+
+    def exit(self, code=0):
+        """Завершить цикл событий с кодом code."""
+        self.post(self.setCode, (code,))
+
+    def setCode(self, code):
+        self.code = code
+
+
+class QTimer(QObject):
+    """Таймер цикла событий."""
+    timeout = pyqtSignal()
+
+    def __init__(self, parent=None):
+        """Инициализация остановленного таймера."""
+        super().__init__(parent)
+        self.milliseconds = 0
+        self.single = False
+        self.active = False
+        self.serial = 0
+
+    def setSingleShot(self, single):
+        self.single = single
+
+    def setTimerType(self, type):
+        pass
+
+    def setInterval(self, milliseconds):
+        self.milliseconds = milliseconds
+
+    def interval(self):
+        return self.milliseconds
+
+    def isActive(self):
+        return self.active
+
+    def start(self, milliseconds=None):
+        """Запустить (перезапустить) таймер."""
+        if milliseconds is not None:
+            self.milliseconds = milliseconds
+        self.serial += 1
+        self.active = True
+        QCoreApplication.instance().schedule(
+            self, time.monotonic() + self.milliseconds / 1000)
+
+    def stop(self):
+        """Остановить таймер."""
+        self.serial += 1
+        self.active = False
+
+    def fire(self, deadline):
+        """Срабатывание таймера."""
+        if self.single:
+            self.active = False
+        else:
+            # Следующее срабатывание - через интервал от предыдущего,
+            # без накопления пропущенных.
+            deadline = max(
+                deadline + self.milliseconds / 1000,
+                time.monotonic())
+            QCoreApplication.instance().schedule(self, deadline)
+        self.timeout.emit()
+
+    @staticmethod
+    def singleShot(milliseconds, slot):
+        """Вызвать slot один раз через milliseconds мс."""
+        timer = QTimer()
+        timer.setSingleShot(True)
+        timer.timeout.connect(slot)
+        timer.start(milliseconds)
+
+
+class QThread(QObject):
+    """Поток с сигналами started и finished."""
+    started = pyqtSignal()
+    finished = pyqtSignal()
+
+    def __init__(self, parent=None):
+        """Инициализация потока."""
+        super().__init__(parent)
+        self.thread = None
+
+    def start(self):
+        """Запустить поток, если он не выполняется."""
+        if self.isRunning():
+            return
+        self.thread = threading.Thread(target=self.main, daemon=True)
+        self.thread.start()
+
+    def main(self):
+        """Выполнить run и отправить сигналы started и finished."""
+        self.started.emit()
+        try:
+            self.run()
+        finally:
+            self.finished.emit()
+
+    def run(self):
+        """Основная функция потока."""
+        pass
+
+    def isRunning(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def isFinished(self):
+        return self.thread is not None and not self.thread.is_alive()
+
+    def wait(self, milliseconds=None):
+        """Дождаться завершения потока."""
+        if self.thread is None or \
+                self.thread is threading.current_thread():
+            return True
+        self.thread.join(
+            None if milliseconds is None else milliseconds / 1000)
+        return not self.thread.is_alive()
+
+
+if enabled:
+    QtCore = sys.modules[__name__]
+else:
+    from PyQt5 import QtCore
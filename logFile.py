@@ -0,0 +1,66 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import os
+import time
+
+import dayFile
+
+
+class LogFile:
+    """Буферизованная запись лога в файл суток Y.M.D.log.
+
+    Файл остаётся открытым до смены суток, строки накапливаются в буфере
+    и записываются одним вызовом не реже чем раз в maxDelay секунд."""
+
+    def __init__(self, maxDelay=1):
+        """Инициализация с максимальным временем хранения строк в буфере
+        maxDelay секунд."""
+        self.maxDelay = maxDelay
+        self.key = None
+        self.file = None
+        self.lines = []
+        self.first = None
+
+    def write(self, pathData, date, text):
+        """Добавить строку text в лог суток date в папке pathData."""
+        key = (pathData, date.date())
+        if key != self.key:
+            self.close()
+            self.open(pathData, date)
+            self.key = key
+        if not self.lines:
+            self.first = time.monotonic()
+        self.lines.append(text + '\n')
+        if time.monotonic() - self.first >= self.maxDelay:
+            self.flush()
+
+    def open(self, pathData, date):
+        """Открыть файл лога суток для добавления."""
+        base = dayFile.path(pathData, date)
+        directory = base[:base.rfind('\\')]
+        os.makedirs(directory, 0o777, True)
+        self.file = open(base + '.log', 'a')
+
+    def pending(self):
+        """Проверить, есть ли незаписанные строки."""
+        return bool(self.lines)
+
+    def flush(self):
+        """Записать буфер в файл."""
+        if self.lines:
+            lines = ''.join(self.lines)
+            self.lines.clear()
+            self.file.write(lines)
+            self.file.flush()
+
+    def close(self):
+        """Записать буфер и закрыть файл."""
+        try:
+            self.flush()
+        finally:
+            if self.file is not None:
+                self.file.close()
+            self.file = None
+            self.key = None
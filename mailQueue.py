@@ -0,0 +1,154 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class MailQueue:
+    """Очередь отправки отчётов, хранимая на диске.
+
+    Отчёт определяется ключом (адрес, сутки, режим, время отправки).
+    Неотправленные отчёты хранятся в файле queue и отправляются повторно
+    с экспоненциально растущей задержкой; отправленные записываются
+    в файл sent, чтобы каждый отчёт был отправлен один раз.
+
+    Очередь изменяется потоком отправки и читается из главного потока,
+    поэтому открытые методы выполняются под блокировкой."""
+
+    def __init__(self, path, delay=60, maxDelay=3600, attempts=10, days=7):
+        """Инициализация очереди в папке path:
+
+        delay - задержка перед первой повторной отправкой в секундах;
+
+        maxDelay - максимальная задержка в секундах;
+
+        attempts - количество попыток, после которого отчёт удаляется;
+
+        days - сколько суток хранить записи об отправленных отчётах."""
+        self.path = path
+        self.delay = delay
+        self.maxDelay = maxDelay
+        self.attempts = attempts
+        self.days = days
+        self.lock = threading.Lock()
+        # Ключ -> [количество попыток, время следующей попытки].
+        self.queue = {}
+        self.sent = set()
+        self.read()
+
+    def read(self):
+        """Считать очередь и отправленные отчёты из файлов."""
+        with self.lock:
+            self.queue = {}
+            self.sent = set()
+            oldest = (datetime.now() - timedelta(days=self.days)).strftime(
+                '%Y.%m.%d')
+            pathQueue = '{}/queue'.format(self.path)
+            if os.path.exists(pathQueue):
+                with open(pathQueue, 'r', encoding='utf-8') as file:
+                    for line in file:
+                        temp = line.replace('\n', '').split(';')
+                        if len(temp) == 6:
+                            try:
+                                self.queue[tuple(temp[:4])] = [
+                                    int(temp[4]), float(temp[5])]
+                            except ValueError:
+                                pass
+            pathSent = '{}/sent'.format(self.path)
+            if os.path.exists(pathSent):
+                with open(pathSent, 'r', encoding='utf-8') as file:
+                    for line in file:
+                        temp = line.replace('\n', '').split(';')
+                        if len(temp) == 4 and temp[1] >= oldest:
+                            self.sent.add(tuple(temp))
+                # Переписать файл без устаревших записей.
+                self.save(pathSent, [';'.join(key) for key in self.sent])
+
+    def save(self, path, lines):
+        """Атомарно записать строки lines в файл path."""
+        if not os.path.exists(self.path):
+            os.makedirs(self.path, 0o777, True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(''.join(line + '\n' for line in lines))
+        os.replace(path + '.tmp', path)
+
+    def saveQueue(self):
+        """Записать очередь в файл."""
+        self.save(
+            '{}/queue'.format(self.path),
+            [
+                '{};{};{}'.format(';'.join(key), attempts, due)
+                for key, (attempts, due) in self.queue.items()
+            ])
+
+    def add(self, address, day, mode, slot):
+        """Добавить отчёт в очередь, если он ещё не отправлен
+        и не ожидает отправки.
+
+        day - сутки отчёта в виде 'Y.M.D'; mode - 'C' или 'P';
+        slot - время отправки в виде 'HH:MM'."""
+        with self.lock:
+            key = (address, day, mode, slot)
+            if key in self.sent or key in self.queue:
+                return False
+            self.queue[key] = [0, time.time()]
+            self.saveQueue()
+            return True
+
+    def due(self, now=None):
+        """Вернуть ключи отчётов, время отправки которых наступило."""
+        with self.lock:
+            if now is None:
+                now = time.time()
+            return sorted(
+                (key for key, (attempts, due) in self.queue.items()
+                 if due <= now),
+                key=lambda key: self.queue[key][1])
+
+    def delivered(self, key):
+        """Отметить отчёт как отправленный."""
+        with self.lock:
+            self.queue.pop(key, None)
+            self.sent.add(key)
+            if not os.path.exists(self.path):
+                os.makedirs(self.path, 0o777, True)
+            path = '{}/sent'.format(self.path)
+            with open(path, 'a', encoding='utf-8') as file:
+                file.write(';'.join(key) + '\n')
+            self.saveQueue()
+
+    def failed(self, key):
+        """Отложить отчёт после неудачной отправки.
+
+        Возвращает задержку до следующей попытки в секундах или None,
+        если попытки исчерпаны и отчёт удалён из очереди."""
+        with self.lock:
+            entry = self.queue.get(key)
+            if entry is None:
+                return None
+            entry[0] += 1
+            if entry[0] >= self.attempts:
+                del self.queue[key]
+                self.saveQueue()
+                return None
+            delay = min(self.delay * 2 ** (entry[0] - 1), self.maxDelay)
+            entry[1] = time.time() + delay
+            self.saveQueue()
+            return delay
+
+    def drop(self, key):
+        """Удалить отчёт из очереди без отправки."""
+        with self.lock:
+            if self.queue.pop(key, None) is not None:
+                self.saveQueue()
+
+    def next(self):
+        """Вернуть время ближайшей попытки отправки или None."""
+        with self.lock:
+            if not self.queue:
+                return None
+            return min(due for attempts, due in self.queue.values())
@@ -0,0 +1,88 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import heapq
+import os
+import threading
+from datetime import datetime, timedelta
+
+
+class MailSchedule:
+    """Расписание отправки отчётов.
+
+    Для каждого получателя и каждого времени отправки хранится ближайшее
+    время срабатывания; времена упорядочены в куче. Время последней
+    проверки сохраняется в файле, поэтому отправки, пропущенные при
+    остановке программы или зависании, выполняются при следующей
+    проверке (не более чем за прошедшие maxDelay)."""
+
+    def __init__(self, path, maxDelay=timedelta(days=1)):
+        """Инициализация расписания с файлом времени последней проверки
+        path и максимальным сроком наверстывания maxDelay."""
+        self.path = path
+        self.maxDelay = maxDelay
+        self.heap = []
+        self.lock = threading.Lock()
+        self.last = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as file:
+                    self.last = datetime.fromtimestamp(float(file.read()))
+            except ValueError as e:
+                print(e)
+
+    def build(self, infos, now=None):
+        """Построить расписание для списка EmailInfo infos."""
+        if now is None:
+            now = datetime.now()
+        start = now
+        if self.last is not None:
+            start = min(now, max(self.last, now - self.maxDelay))
+        heap = []
+        for index, info in enumerate(infos):
+            for tt in info.times:
+                heap.append((self.fire(start, tt), index, tt, info))
+        heapq.heapify(heap)
+        with self.lock:
+            self.heap = heap
+
+    def fire(self, start, tt):
+        """Вернуть ближайшее после start время tt = (часы, минуты)."""
+        fire = datetime(start.year, start.month, start.day, tt[0], tt[1])
+        if fire <= start:
+            day = start.date() + timedelta(days=1)
+            fire = datetime(day.year, day.month, day.day, tt[0], tt[1])
+        return fire
+
+    def due(self, now=None):
+        """Вернуть наступившие отправки списком (EmailInfo, время
+        срабатывания) и перенести их на следующее время после now."""
+        if now is None:
+            now = datetime.now()
+        result = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                fire, index, tt, info = self.heap[0]
+                result.append((info, fire))
+                heapq.heapreplace(
+                    self.heap, (self.fire(now, tt), index, tt, info))
+        self.save(now)
+        return result
+
+    def save(self, now):
+        """Сохранить время последней проверки."""
+        self.last = now
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, 0o777, True)
+        with open(self.path + '.tmp', 'w') as file:
+            file.write(str(now.timestamp()))
+        os.replace(self.path + '.tmp', self.path)
+
+    def next(self):
+        """Вернуть время ближайшей отправки или None."""
+        with self.lock:
+            if self.heap:
+                return self.heap[0][0]
+        return None
@@ -3,13 +3,17 @@
 # !/usr/bin/env python3
 
 import sys
-from PyQt5.QtWidgets import QApplication
 
-import mainWindow
 import observer
 
 
 if __name__ == '__main__':
+    if '--headless' in sys.argv:
+        sys.exit(observer.runHeadless(sys.argv))
+
+    from PyQt5.QtWidgets import QApplication
+    import mainWindow
+
     app = QApplication(sys.argv)
     core = observer.Observer()
     ex = mainWindow.MainWindow(core)
@@ -7,12 +7,15 @@ import os
 from PyQt5.QtWidgets import (
     QWidget, QInputDialog, QFileDialog, QMessageBox,
     QAction, QLabel, QLineEdit, QPushButton, QTextEdit, QGridLayout, QCheckBox,
-    QMainWindow, QApplication, QTableWidget, QTableWidgetItem
+    QMainWindow, QApplication, QTableView
 )
 from PyQt5.QtCore import (Qt, QBasicTimer)
 from PyQt5.QtGui import (QIntValidator, QTextCursor)
 from collections import deque
 
+import logFile
+import sensorModel
+
 
 class MainWindow(QMainWindow):
     """Главное окно программы. Управляет интерфейсом и событиями."""
@@ -23,6 +26,13 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.core = core
         self.core.logged.connect(self.onLogged)
+        # Строки лога, ещё не выведенные в текстовое поле.
+        self.logLines = deque(maxlen=100)
+        self.logStatus = None
+        self.logFile = logFile.LogFile()
+        # Обновление лога на экране не чаще 10 раз в секунду.
+        self.timerLog = QBasicTimer()
+        self.timerLogFile = QBasicTimer()
         self.initUI()
         self.command()
 
@@ -117,13 +127,19 @@ class MainWindow(QMainWindow):
         menuHelp.addAction(actionHelpHelp)
         menuHelp.addAction(actionHelpAbout)
 
-        self.textEditList = deque(maxlen=100)
+        self.textEditSize = 100
         self.textEdit.setVerticalScrollBarPolicy(2)
         self.textEdit.setToolTip("Action log.")
         self.textEdit.setReadOnly(True)
 
-        self.isItemSave = False
-        self.table = QTableWidget(0, 3)
+        self.model = sensorModel.SensorModel(self.core.sensors, parent=self)
+        self.modelFilter = sensorModel.SensorFilter(self)
+        self.modelFilter.setSourceModel(self.model)
+        self.modelFilter.rowsInserted.connect(self.onRowsChanged)
+        self.modelFilter.rowsRemoved.connect(self.onRowsChanged)
+        self.modelFilter.modelReset.connect(self.onRowsChanged)
+        self.table = QTableView()
+        self.table.setModel(self.modelFilter)
         self.table.setToolTip("Temperature sensors.")
         self.table.setFixedWidth(342)
         self.table.setVerticalScrollBarPolicy(1)
@@ -132,10 +148,10 @@ class MainWindow(QMainWindow):
         self.table.setColumnWidth(1, 150)
         self.table.setColumnWidth(2, 120)
         self.table.setAlternatingRowColors(True)
-        self.table.setSelectionMode(QTableWidget.SingleSelection)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setHorizontalHeaderLabels(['Val', 'Name', 'Address'])
+        self.table.setSelectionMode(QTableView.SingleSelection)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
         self.table.verticalHeader().setFixedWidth(20)
+        self.table.verticalHeader().setDefaultSectionSize(23)
         self.table.verticalHeader().setDefaultAlignment(Qt.AlignRight)
         self.table.setEditTriggers(self.table.NoEditTriggers)
 
@@ -167,7 +183,10 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """Событие закрытия программы."""
-        self.core.stop()
+        self.core.close()
+        self.timerLog.stop()
+        self.timerLogFile.stop()
+        self.logFile.close()
         super().closeEvent(event)
 
     def onActionFileStartTriggered(self):
@@ -317,25 +336,6 @@ class MainWindow(QMainWindow):
             self.table.setFixedWidth(self.table.width() - 270)
             self.setFixedWidth(self.width() - 270)
 
-    def checkItemSave(self, item):
-        """Проверка изменения ячейки имени датчика."""
-        if item.column() == 1:
-            self.isItemSave = True
-        else:
-            self.isItemSave = False
-
-    def itemSave(self, item):
-        """Сохранение имени в списке."""
-        if self.isItemSave:
-            if item.column() == 1:
-                if item.tableWidget() == self.table:
-                    self.isItemSave = False
-                    self.statusBar().showMessage(item.text() + " save")
-                    temp = self.table.item(item.row(), 2)
-                    key = temp.text()
-                    self.core.sensors[key].name = item.text()
-        self.table.clearSelection()
-
     def onLogged(self, log, modes):
         """Событие логирования.
         
@@ -349,54 +349,62 @@ class MainWindow(QMainWindow):
 
         f - запись в файл."""
         if 'l' in modes:
-            self.textEditList.appendleft(log)
-            self.textEdit.clear()
-            self.textEdit.setText('\n'.join(self.textEditList))
+            self.logLines.append(log)
 
         if 's' in modes:
-            self.statusBar().showMessage(log)
+            self.logStatus = log
+
+        if ('l' in modes or 's' in modes) and not self.timerLog.isActive():
+            self.timerLog.start(100, self)
 
         if 'f' in modes:
-            directory = '{0}\\{1}\\{2}\\{3}'.format(
-                self.core.pathData,
-                self.core.currentDate.strftime('%Y'),
-                self.core.currentDate.strftime('%m'),
-                self.core.currentDate.strftime('%d')
-            )
-            os.makedirs(directory, 0o777, True)
-            with open('{0}\\{1}.log'.format(
-                directory,
-                self.core.currentDate.strftime('%Y.%m.%d')
-            ), 'a') as file:
-                file.write(log + '\n')
+            self.logFile.write(self.core.pathData, self.core.currentDate, log)
+            if self.logFile.pending() and not self.timerLogFile.isActive():
+                self.timerLogFile.start(1000, self)
+
+    def timerEvent(self, event):
+        """Событие таймеров вывода лога."""
+        if event.timerId() == self.timerLog.timerId():
+            self.timerLog.stop()
+            self.showLog()
+        elif event.timerId() == self.timerLogFile.timerId():
+            self.timerLogFile.stop()
+            self.logFile.flush()
+        else:
+            super().timerEvent(event)
+
+    def showLog(self):
+        """Вывести накопленные строки лога в начало текстового поля
+        и в статус бар."""
+        if self.logLines:
+            document = self.textEdit.document()
+            text = '\n'.join(reversed(self.logLines))
+            self.logLines.clear()
+            if not document.isEmpty():
+                text += '\n'
+            cursor = QTextCursor(document)
+            cursor.movePosition(QTextCursor.Start)
+            cursor.insertText(text)
+            # Удалить старые строки в конце поля.
+            if document.blockCount() > self.textEditSize:
+                block = document.findBlockByNumber(self.textEditSize - 1)
+                cursor.setPosition(block.position() + block.length() - 1)
+                cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+                cursor.removeSelectedText()
+
+        if self.logStatus is not None:
+            self.statusBar().showMessage(self.logStatus)
+            self.logStatus = None
 
     def onDataAdded(self):
         """Событие добавления данных."""
-        self.table.setRowCount(len(self.core.sensors))
-        if self.table.rowCount() <= 20:
-            self.table.setMinimumHeight(25 + self.table.rowCount() * 23)
-        i = 0
-        for key in self.core.sensors.keys():
-            if self.core.sensors[key].value is not None:
-                self.table.setRowHeight(i, 23)
-                self.table.setItem(
-                    i,
-                    0,
-                    QTableWidgetItem(self.core.sensors[key].value)
-                )
-                self.table.setItem(
-                    i,
-                    1,
-                    QTableWidgetItem(self.core.sensors[key].name)
-                )
-                self.table.setItem(
-                    i,
-                    2,
-                    QTableWidgetItem(key)
-                )
-                i += 1
-        self.table.setRowCount(i)
-        self.table.sortItems(1)
+        self.model.update()
+
+    def onRowsChanged(self):
+        """Изменение количества показанных датчиков."""
+        rowCount = self.modelFilter.rowCount()
+        if rowCount <= 20:
+            self.table.setMinimumHeight(25 + rowCount * 23)
 
     def onAbout(self):
         """Действие нажатия Помощь -> О программе."""
@@ -418,7 +426,8 @@ class MainWindow(QMainWindow):
         text = '<p><b>Console parametrs</b><br>'\
                'usage: main [options]<br>'\
                'where options have next key:<br>'\
-               '-s [seconds]: start monitoring with a period of [seconds]</p>'\
+               '-s [seconds]: start monitoring with a period of [seconds]<br>'\
+               '--headless: run without graphical interface</p>'\
                '<p><b>Code and name</b><br>'\
                'Write your address and sensors in the appropriate files:<br>'\
                '{}<br>{}/*</p>'\
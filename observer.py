@@ -2,17 +2,26 @@
 
 # !/usr/bin/env python3
 
-import requests
 import os
-from PyQt5 import QtCore
+import signal
+import sys
+from headless import QtCore
 from datetime import datetime, timedelta
 
+import dataStore
+import dataWriter
 import threadGet
+import threadPoll
 import threadServer
 import threadChart
 import threadMail
+import threadWatch
 import time
 import sensor
+import sensorConfig
+import logFile
+import addressHealth
+import pollSchedule
 
 
 class Observer(QtCore.QObject):
@@ -26,6 +35,7 @@ class Observer(QtCore.QObject):
         self.pathAddresses = "config/addresses"
         self.pathConfig = "config/config"
         self.pathEmails = 'config/emails'
+        self.pathMail = 'config/mail'
         self.pathFolder = 'config'
         self.pathData = "data"
         self.pathSensors = "config/sensors"
@@ -36,15 +46,40 @@ class Observer(QtCore.QObject):
             self.currentDate.day - 1
         )
         self.addresses = {}
-        self.sensors = {}
-        self.groups = {}
+        # Собственные периоды опроса адресов в секундах.
+        self.addressPeriods = {}
+        # Реестр датчиков: адрес -> sensor.Sensor, группы.
+        self.sensors = sensor.SensorRegistry()
         self.period = 60
         self.countPeriod = 2
+        self.engine = 'async'
+        self.limit = 64
+        self.poolSize = 256
+        self.poolIdle = 300
+        self.binary = 1
+        self.spread = 0.8
+        self.schedule = pollSchedule.PollSchedule()
         self.threads = []
+        # Ключ запроса (раунд, адрес, задержка) -> время этапов ответа.
+        self.timings = {}
+        # Номер текущего раунда опроса: завершения запросов прошлых
+        # раундов не учитываются в счётчиках текущего.
+        self.round = 0
+        self.health = addressHealth.AddressHealth()
+        self.requestsCount = 0
+        self.requestsFailedCount = 0
+        self.requestsSkipped = 0
+        self.linesMalformedCount = 0
+        self.writer = dataWriter.DataWriter()
+        self.store = dataStore.DataStore()
+        self.requestsPending = 0
 
-        self.email = threadMail.ThreadMail(self.pathEmails)
+        self.email = threadMail.ThreadMail(self.pathEmails, self.pathMail)
         self.email.mailReceived.connect(self.mailReceivedEvent)
         self.email.mailFailed.connect(self.mailFailedEvent)
+        self.email.finished.connect(
+            self.onMailFinished,
+            QtCore.Qt.QueuedConnection)
 
         self.chart = threadChart.ThreadChart()
         self.chart.chartSaved.connect(
@@ -52,10 +87,52 @@ class Observer(QtCore.QObject):
             QtCore.Qt.QueuedConnection
         )
 
+        self.poller = threadPoll.ThreadPoll()
+        self.poller.requestReceived.connect(
+            self.onRequestReceived,
+            QtCore.Qt.QueuedConnection)
+        self.poller.requestFailed.connect(
+            self.onRequestFailed,
+            QtCore.Qt.QueuedConnection)
+        self.poller.requestTimed.connect(
+            self.onRequestTimed,
+            QtCore.Qt.QueuedConnection)
+        self.poller.requestLatency.connect(
+            self.onRequestLatency,
+            QtCore.Qt.QueuedConnection)
+        self.poller.requestFinished.connect(
+            self.onRequestFinished,
+            QtCore.Qt.QueuedConnection)
+
+        self.server = threadServer.ThreadServer()
+        self.server.requestReceived.connect(
+            self.onRequestReceived,
+            QtCore.Qt.QueuedConnection)
+        self.server.requestFailed.connect(
+            self.onRequestFailed,
+            QtCore.Qt.QueuedConnection)
+        self.server.requestFinished.connect(
+            self.onRequestFinished,
+            QtCore.Qt.QueuedConnection)
+
         self.timerRequests = QtCore.QTimer()
         self.timerRequests.timeout.connect(self.timerRequestsEvent)
         self.timerChart = QtCore.QTimer()
         self.timerChart.timeout.connect(self.timerChartEvent)
+        # Таймер отправки отчётов по расписанию и из очереди.
+        self.timerMail = QtCore.QTimer()
+        self.timerMail.setSingleShot(True)
+        self.timerMail.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timerMail.timeout.connect(self.timerMailEvent)
+
+        # Изменения файлов адресов и датчиков во время наблюдения
+        # применяются в начале следующего раунда опроса.
+        self.watcher = threadWatch.ThreadWatch()
+        self.watcher.changed.connect(
+            self.onConfigChanged,
+            QtCore.Qt.QueuedConnection)
+        self.pendingAddresses = None
+        self.pendingSensors = None
         self.read()
 
     def start(self):
@@ -69,8 +146,11 @@ class Observer(QtCore.QObject):
                 'lf'
             )
             self.read()
+            self.watcher.watch(self.pathAddresses, self.pathSensors)
+            self.loadData(now)
             self.timerRequests.start(int(self.period) * 1000)
             self.timerChart.start(int(self.period) * 1000 * self.countPeriod)
+            self.scheduleMail()
             self.timerRequestsEvent()
 
     def stop(self):
@@ -78,12 +158,29 @@ class Observer(QtCore.QObject):
         if self.timerRequests.isActive() and self.timerChart.isActive():
             self.timerRequests.stop()
             self.timerChart.stop()
+            self.timerMail.stop()
+            self.watcher.stop()
+            self.pendingAddresses = None
+            self.pendingSensors = None
+            self.flushData()
             text = '{} Observation stopped.'.format(
                 datetime.now().strftime('%H:%M:%S')
             )
             self.logged.emit('\n{}'.format(text), 'l')
             self.logged.emit(text, 'f')
 
+    def close(self):
+        """Остановить мониторинг и поток опроса перед выходом."""
+        self.stop()
+        self.watcher.stop()
+        self.poller.stop()
+        self.server.stop()
+        self.chart.shutdown()
+        self.timerMail.stop()
+        self.email.wait()
+        threadGet.pool.clear()
+        self.flushData(True)
+
     def timerRequestsEvent(self):
         """Событие таймера запросов."""
         self.sendRequests()
@@ -96,9 +193,11 @@ class Observer(QtCore.QObject):
         """Проверить и изменить текущую дату."""
         if self.currentDate.date() != date.date():
             self.draw()
+            self.flushData(True)
             # self.send_mail()
             self.prevDate = self.currentDate
             self.currentDate = date
+            self.loadData(date)
             self.logged.emit(
                 'New day {}.'.format(self.currentDate.strftime('%Y.%m.%d')),
                 'l'
@@ -106,20 +205,49 @@ class Observer(QtCore.QObject):
 
     def sendRequests(self):
         """Отправить запросы."""
-        for key in self.sensors.keys():
-            self.sensors[key].value = None
+        self.applyPending()
+        self.sensors.reset()
 
-        self.requestsCount = len(self.addresses)
-        self.requestsFailedCount = 0
         timeBegin = datetime.now()
+        # Недоступные адреса опрашиваются только для проверки.
+        addresses, skipped = self.health.split(self.addresses)
+        # Запросы распределяются по периоду опроса.
+        self.schedule.spread = float(self.spread)
+        plan = self.schedule.plan(
+            addresses,
+            self.addressPeriods,
+            timeBegin.timestamp(),
+            int(self.period),
+            self.health.maxTimeout)
+        self.round += 1
+        self.requestsCount = len(plan)
+        self.requestsPending = len(plan)
+        self.requestsFailedCount = 0
+        self.requestsSkipped = len(skipped)
+        self.linesMalformedCount = 0
         self.logged.emit(
             '{0} Sending requests\n'.format(timeBegin.strftime('%H:%M:%S')),
             'l'
         )
+        if skipped:
+            self.logged.emit(
+                '{} not responding addresses skipped.'.format(len(skipped)),
+                'l')
         self.logged.emit('Sending requests...', 's')
         self.checkCurrentDay(timeBegin)
-        for address in self.addresses:
-            self.get(address)
+        if self.engine == 'threads':
+            threadGet.pool.configure(int(self.poolSize), int(self.poolIdle))
+            for address, delay in plan:
+                self.get(address, self.health.timeout(address), delay)
+        else:
+            self.poller.limit = int(self.limit)
+            self.poller.poll(
+                plan,
+                {
+                    address: self.health.timeout(address)
+                    for address in addresses
+                },
+                self.round)
         self.getServer()
 
     def configRead(self):
@@ -155,6 +283,18 @@ class Observer(QtCore.QObject):
                                 self.pathSensors = temp[1]
                             elif temp[0] == "period":
                                 self.period = temp[1]
+                            elif temp[0] == "engine":
+                                self.engine = temp[1]
+                            elif temp[0] == "limit":
+                                self.limit = temp[1]
+                            elif temp[0] == "poolSize":
+                                self.poolSize = temp[1]
+                            elif temp[0] == "poolIdle":
+                                self.poolIdle = temp[1]
+                            elif temp[0] == "binary":
+                                self.binary = temp[1]
+                            elif temp[0] == "spread":
+                                self.spread = temp[1]
                     file.close()
             except Exception as error:
                 self.logged.emit(
@@ -186,7 +326,13 @@ class Observer(QtCore.QObject):
                 file.write(
                     "pathData = {}\n".format(self.pathData))
                 file.write("pathSensors = {}\n".format(self.pathSensors))
-                file.write("period = {}".format(self.period))
+                file.write("period = {}\n".format(self.period))
+                file.write("engine = {}\n".format(self.engine))
+                file.write("limit = {}\n".format(self.limit))
+                file.write("poolSize = {}\n".format(self.poolSize))
+                file.write("poolIdle = {}\n".format(self.poolIdle))
+                file.write("binary = {}\n".format(self.binary))
+                file.write("spread = {}".format(self.spread))
                 file.close()
         except Exception as error:
             self.logged.emit(
@@ -198,16 +344,8 @@ class Observer(QtCore.QObject):
         """Считать из файла адреса модулей."""
         if os.path.exists(self.pathAddresses):
             try:
-                with open(self.pathAddresses, 'r', encoding="utf-8") as file:
-                    for line in file:
-                        line = line.replace('\n', '')
-                        line = line.replace(' = ', '=')
-                        temp = line.split('=')
-                        if len(temp) > 1:
-                            self.addresses[temp[0]] = temp[1]
-                        else:
-                            self.addresses[temp[0]] = 'No name'
-                file.close()
+                self.applyAddresses(
+                    *sensorConfig.readAddresses(self.pathAddresses))
             except Exception as error:
                 self.logged.emit(
                     '{} Addresses not readed from "{}"!'.format(
@@ -217,6 +355,19 @@ class Observer(QtCore.QObject):
         else:
             os.makedirs(self.pathFolder, 0o777, True)
 
+    def applyAddresses(self, names, periods):
+        """Заменить адреса модулей и их периоды опроса.
+
+        Возвращает количество добавленных и удалённых адресов."""
+        removed = [key for key in self.addresses if key not in names]
+        added = [key for key in names if key not in self.addresses]
+        for key in removed:
+            del self.addresses[key]
+        self.addresses.update(names)
+        self.addressPeriods = dict(periods)
+        self.schedule.forget(self.addresses)
+        return len(added), len(removed)
+
     def addressesSave(self):
         """Сохранить в файл адреса модулей."""
         if not os.path.exists(self.pathFolder):
@@ -225,8 +376,14 @@ class Observer(QtCore.QObject):
             if len(self.addresses) != 0:
                 with open(self.pathAddresses, 'w', encoding="utf-8") as file:
                     for key in self.addresses.keys():
-                        file.write(
-                            "{0} = {1}\n".format(key, self.addresses[key]))
+                        if key in self.addressPeriods:
+                            file.write("{0} = {1} = {2}\n".format(
+                                key,
+                                self.addresses[key],
+                                self.addressPeriods[key]))
+                        else:
+                            file.write(
+                                "{0} = {1}\n".format(key, self.addresses[key]))
                     file.close()
         except Exception:
             self.logged.emit(
@@ -238,30 +395,7 @@ class Observer(QtCore.QObject):
         """Считать датчики из файла."""
         if os.path.exists(self.pathSensors):
             try:
-                fileList = os.listdir(self.pathSensors)
-                self.sensors.clear()
-                self.groups.clear()
-                for fileName in fileList:
-                    with open(
-                        '{}/{}'.format(self.pathSensors, fileName),
-                        'r',
-                        encoding="utf-8"
-                    ) as file:
-                        for line in file:
-                            line = line.replace('\n', '')
-                            line = line.replace(' = ', '=')
-                            temp = line.split('=')
-                            if len(temp) > 1:
-                                name = temp[1]
-                            else:
-                                name = 'No name'
-                            ss = sensor.Sensor(temp[0], file, name)
-                            self.sensors[temp[0]] = ss
-                            if fileName in self.groups:
-                                self.groups[fileName].add(ss)
-                            else:
-                                self.groups[fileName] = {ss}
-                        file.close()
+                self.applySensors(sensorConfig.load(self.pathSensors))
             except Exception:
                 self.logged.emit(
                     '{} Sensors not readed from "{}"!'.format(
@@ -271,19 +405,71 @@ class Observer(QtCore.QObject):
         else:
             os.makedirs(self.pathSensors, 0o777, True)
 
+    def applySensors(self, config):
+        """Привести реестр датчиков к настройкам config
+        (sensorConfig.SensorConfig).
+
+        Датчики группы 'unknown', найденные в ответах модулей, остаются.
+        Возвращает количество добавленных и удалённых датчиков."""
+        sensors = {}
+        for group, items in config.groups.items():
+            for address, name in items.items():
+                sensors[address] = (group, name)
+        removed = [
+            ss.address for ss in self.sensors.list
+            if ss.address not in sensors and ss.group != 'unknown'
+        ]
+        added = [key for key in sensors if key not in self.sensors]
+        if removed:
+            self.sensors.remove(removed)
+        for address, (group, name) in sensors.items():
+            ss = self.sensors.get(address)
+            if ss is None or ss.group != group or ss.name != name:
+                self.sensors.add(address, group, name)
+        return len(added), len(removed)
+
+    def onConfigChanged(self, addresses, config):
+        """Файлы адресов или датчиков изменились: запомнить новые
+        настройки до начала следующего раунда."""
+        if addresses is not None:
+            self.pendingAddresses = addresses
+        if config is not None:
+            self.pendingSensors = config
+
+    def applyPending(self):
+        """Применить изменения файлов адресов и датчиков между раундами,
+        не затрагивая отправленные запросы."""
+        addresses, self.pendingAddresses = self.pendingAddresses, None
+        config, self.pendingSensors = self.pendingSensors, None
+        now = datetime.now().strftime('%H:%M:%S')
+        if addresses is not None:
+            added, removed = self.applyAddresses(*addresses)
+            if added or removed:
+                self.logged.emit(
+                    '{} Addresses reloaded: {} added, {} removed.'.format(
+                        now, added, removed),
+                    'lf')
+        if config is not None:
+            added, removed = self.applySensors(config)
+            if added or removed:
+                self.logged.emit(
+                    '{} Sensors reloaded: {} added, {} removed.'.format(
+                        now, added, removed),
+                    'lf')
+
     def sensorsSave(self):
         """Сохранить датчики в файл."""
         if not os.path.exists(self.pathSensors):
             os.makedirs(self.pathSensors, 0o777, True)
         try:
             if len(self.sensors) != 0:
-                for group, sens in self.groups.items():
+                for group, sens in self.sensors.groups.items():
                     with open(
                         '{}/{}'.format(self.pathSensors, group),
                         'w',
                         encoding="utf-8"
                     ) as file:
-                        for item in sens:
+                        for item in sens.values():
                             file.write(
                                 '{} = {}\n'.format(item.address, item.name))
                         file.close()
@@ -306,21 +492,53 @@ class Observer(QtCore.QObject):
         self.addressesSave()
         self.configSave()
 
-    def onRequestReceived(self, lines, address, delta, date):
+    def onRequestTimed(self, address, headers, transfer, key):
+        """Получено время до заголовков и передачи тела ответа."""
+        self.timings[key] = (headers, transfer)
+
+    def onRequestLatency(self, address, latency):
+        """Получена задержка ответа адреса."""
+        self.health.success(address, latency)
+
+    def onRequestReceived(self, batch, address, delta, date, key):
         """Ответ на запрос получен: сохранить данные."""
-        self.addData(lines, date)
+        self.addData(batch, date)
+        timing = self.timings.pop(key, None)
         if address in self.addresses:
             if self.addresses[address] != 'No name':
                 address = self.addresses[address]
-        self.logged.emit('{0} received ({1} s).'.format(address, delta), 'l')
+        if batch.malformed:
+            if key[0] == self.round:
+                self.linesMalformedCount += batch.malformed
+            self.logged.emit(
+                '{0} {1}: {2} malformed lines skipped.'.format(
+                    date.strftime('%H:%M:%S'), address, batch.malformed),
+                'lf')
+        if timing is None:
+            self.logged.emit(
+                '{0} received ({1} s).'.format(address, delta), 'l')
+        else:
+            self.logged.emit(
+                '{0} received ({1} s: headers {2} s, transfer {3} s).'.format(
+                    address, delta, timing[0], timing[1]),
+                'l')
 
-    def onRequestFailed(self, address, delta, time):
+    def onRequestFailed(self, address, delta, time, key):
         """Запрос не удался."""
+        self.timings.pop(key, None)
+        backoff = None
         if address in self.addresses:
+            backoff = self.health.failure(address)
             if self.addresses[address] != 'No name':
                 address = self.addresses[address]
-        self.requestsFailedCount += 1
+        if key[0] == self.round:
+            self.requestsFailedCount += 1
         self.logged.emit('{0} failed ({1} s)!'.format(address, delta), 'l')
+        if backoff is not None:
+            self.logged.emit(
+                '{0} {1} is not responding, next check in {2} s.'.format(
+                    time.strftime('%H:%M:%S'), address, int(backoff)),
+                'lf')
         self.logged.emit(
             '{0} Request to {1} failed ({2} s)!'.format(
                 time.strftime('%H:%M:%S'),
@@ -328,70 +546,95 @@ class Observer(QtCore.QObject):
                 delta),
             'f')
 
-    def addData(self, lines, date):
-        """Записать данные в файл с указанной датой."""
-        directory = '{0}\\{1}\\{2}\\{3}'.format(
-            self.pathData,
-            date.strftime('%Y'),
-            date.strftime('%m'),
-            date.strftime('%d')
-        )
-        name = date.strftime('%Y.%m.%d')
-        if not os.path.exists(directory):
-            os.makedirs(directory, 0o777, True)
+    def addData(self, batch, date):
+        """Добавить показания batch (responseParser.Batch) в буфер записи
+        файла с указанной датой."""
+        stamp = date.timestamp()
+        current = self.store.date == date.date()
+        rows = []
+        for address, text, value in batch.rows():
+            ss = self.sensors.get(address)
+            if ss is None:
+                ss = self.sensors.add(address, 'unknown')
+            ss.value = value
+            ss.text = text
+            # Ответ на запрос, отправленный в прошлые сутки,
+            # записывается только в файл.
+            if current:
+                self.store.append(address, stamp, value)
+            rows.append((address, ss.name, text, value))
         try:
-            with open('{0}\\{1}.csv'.format(directory, name), 'a') as file:
-                for line in lines:
-                    if line != ' ':
-                        temp = line.split(' ')
-                        if len(temp) == 2:
-                            temp[1] = temp[1].replace('\r', '')
-                            if temp[0] in self.sensors.keys():
-                                self.sensors[temp[0]].value = temp[1]
-                            else:
-                                group = 'unknown'
-                                ss = sensor.Sensor(
-                                    temp[0],
-                                    group,
-                                    'No name',
-                                    temp[1]
-                                )
-                                self.sensors[temp[0]] = ss
-                                if group in self.groups:
-                                    self.groups[group].add(ss)
-                                else:
-                                    self.groups[group] = {ss}
-
-                            file.write(
-                                '{0};{1};{2};{3}\n'.format(
-                                    date.strftime('%H:%M:%S'),
-                                    temp[0],
-                                    self.sensors[temp[0]].name,
-                                    self.sensors[temp[0]].value
-                                )
-                            )
+            self.writer.binary = bool(int(self.binary))
+            self.writer.write(self.pathData, date, rows)
             self.dataAdded.emit()
         except Exception:
             self.logged.emit(
                 '{} Data not saved to {}!'.format(
                     date.strftime('%H:%M:%S'),
-                    name),
+                    date.strftime('%Y.%m.%d')),
+                'lsf')
+
+    def loadData(self, date):
+        """Загрузить в хранилище данные суток date, если они ещё
+        не загружены."""
+        if self.store.date == date.date():
+            return
+        try:
+            self.store.load(self.pathData, date)
+        except Exception:
+            self.store.reset(date)
+            self.logged.emit(
+                '{} Data not loaded from {}!'.format(
+                    datetime.now().strftime('%H:%M:%S'),
+                    date.strftime('%Y.%m.%d')),
                 'lsf')
 
+    def flushData(self, close=False):
+        """Записать буфер данных в файл; при close закрыть файл."""
+        try:
+            if close:
+                self.writer.close()
+            else:
+                self.writer.flush()
+        except Exception:
+            self.logged.emit(
+                '{} Data not saved!'.format(
+                    datetime.now().strftime('%H:%M:%S')),
+                'lsf')
+
+    def onRequestFinished(self, address, key):
+        """Событие завершения запроса."""
+        # Время этапов остаётся, если ответ с кодом 200 был пустым.
+        self.timings.pop(key, None)
+        # Запрос прошлого раунда, затянувшийся дольше периода опроса,
+        # в состоянии текущего раунда не учитывается.
+        if key[0] != self.round:
+            return
+        self.requestsPending -= 1
+        self.onFinished()
+
+    def onThreadFinished(self):
+        """Событие завершения потока запроса: удалить поток."""
+        self.threads = [
+            thread for thread in self.threads if not thread.isFinished()]
+
     def onFinished(self):
-        """Событие завершения потока: удалить поток."""
-        for thread in self.threads:
-            if thread.isFinished():
-                self.threads.remove(thread)
+        """Показать состояние раунда; в конце раунда записать данные."""
+        pending = self.requestsPending
         text = '{} of {} responses'.format(
-            self.requestsCount - len(self.threads),
+            self.requestsCount - pending,
             self.requestsCount)
 
         if self.requestsFailedCount != 0:
             text += ' ({} is failed)'.format(self.requestsFailedCount)
+        if self.requestsSkipped != 0:
+            text += ' ({} skipped)'.format(self.requestsSkipped)
+        if self.linesMalformedCount != 0:
+            text += ' ({} malformed lines)'.format(self.linesMalformedCount)
 
-        if len(self.threads) == 0:
+        if pending == 0:
             text += '.'
+            self.flushData()
         else:
             text += '...'
         self.logged.emit(text, 's')
@@ -401,51 +644,88 @@ class Observer(QtCore.QObject):
         self.logged.emit(message, 'ls')
         self.send_mail()
 
-    def get(self, address):
-        """Отправить запрос в новом потоке."""
-        thread = threadGet.ThreadGet(address)
-        thread.requestReceived.connect(
-            self.onRequestReceived,
+    def get(self, address, timeout=10, delay=0):
+        """Отправить запрос в новом потоке через delay секунд с временем
+        ожидания timeout."""
+        thread = threadGet.ThreadGet(address, timeout, delay, self.round)
+        thread.requestTimed.connect(
+            self.onRequestTimed,
             QtCore.Qt.QueuedConnection)
-        thread.requestFailed.connect(
-            self.onRequestFailed,
+        thread.requestLatency.connect(
+            self.onRequestLatency,
             QtCore.Qt.QueuedConnection)
-        thread.finished.connect(
-            self.onFinished,
-            QtCore.Qt.QueuedConnection)
-        self.threads.append(thread)
-        thread.start()
-
-    def getServer(self):
-        """Получить данные ресурсов компьютера в новом потоке."""
-        thread = threadServer.ThreadServer()
         thread.requestReceived.connect(
             self.onRequestReceived,
             QtCore.Qt.QueuedConnection)
         thread.requestFailed.connect(
             self.onRequestFailed,
             QtCore.Qt.QueuedConnection)
+        thread.requestFinished.connect(
+            self.onRequestFinished,
+            QtCore.Qt.QueuedConnection)
         thread.finished.connect(
-            self.onFinished,
+            self.onThreadFinished,
             QtCore.Qt.QueuedConnection)
         self.threads.append(thread)
         thread.start()
 
+    def getServer(self):
+        """Получить данные ресурсов компьютера из потока измерений."""
+        self.requestsCount += 1
+        self.requestsPending += 1
+        self.server.poll(self.round)
+
     def draw(self):
         """Сохранить график в новом потоке."""
-        self.chart.set_path(self.pathData, self.currentDate)
+        self.flushData()
+        if self.store.date == self.currentDate.date():
+            self.chart.set_path(
+                self.pathData,
+                self.currentDate,
+                self.store.snapshot(),
+                self.sensors.names(),
+                self.pathSensors)
+        else:
+            self.chart.set_path(
+                self.pathData,
+                self.currentDate,
+                pathSensors=self.pathSensors)
         self.chart.start()
 
     def send_mail(self):
         """Отправить имейлы в новом потоке."""
-        self.email.set_path(
-            self.pathData,
-            self.currentDate,
-            self.prevDate,
-            int(self.period) * int(self.countPeriod)
-        )
+        self.email.set_path(self.pathData)
         self.email.start()
 
+    def onMailFinished(self):
+        """Отправка имейлов завершена."""
+        if self.timerRequests.isActive():
+            self.scheduleMail()
+
+    def scheduleMail(self):
+        """Запустить таймер до ближайшей отправки по расписанию
+        или повторной отправки отчёта из очереди."""
+        due = self.email.schedule.next()
+        if due is not None:
+            due = due.timestamp()
+        retry = self.email.queue.next()
+        if retry is not None and (due is None or retry < due):
+            due = retry
+        if due is not None:
+            delay = max(0, due - time.time())
+            self.timerMail.start(int(min(delay, 86400) * 1000) + 1)
+
+    def timerMailEvent(self):
+        """Событие таймера отправки имейлов.
+
+        Если наступило время отправки по расписанию, перед отправкой
+        рисуется свежий график; иначе отправляются отчёты из очереди."""
+        due = self.email.schedule.next()
+        if due is not None and due <= datetime.now():
+            self.draw()
+        else:
+            self.send_mail()
+
     def mailReceivedEvent(self, message, s):
         """Имейл отправлен."""
         self.logged.emit('{} ({})'.format(message, s), 'ls')
@@ -455,3 +735,39 @@ class Observer(QtCore.QObject):
         self.logged.emit('{} ({})'.format(message, s), 'l')
         self.logged.emit(
             '{} {} ({})'.format(time.strftime('%H:%M:%S'), message, s), 'sf')
+
+
+def runHeadless(argv):
+    """Запустить мониторинг без графического интерфейса.
+
+    usage: python -m observer --headless [-s seconds]
+
+    Лог выводится в консоль и в файл суток; Ctrl+C - остановка."""
+    app = QtCore.QCoreApplication(argv)
+    core = Observer()
+    log = logFile.LogFile()
+
+    def onLogged(text, modes):
+        """Вывод лога в консоль и в файл."""
+        if 'l' in modes:
+            print(text, flush=True)
+        if 'f' in modes:
+            log.write(core.pathData, core.currentDate, text)
+
+    core.logged.connect(onLogged)
+    if '-s' in argv:
+        i = argv.index('-s')
+        if i + 1 < len(argv) and argv[i + 1].isdigit():
+            core.period = argv[i + 1]
+
+    signal.signal(signal.SIGINT, lambda *args: app.quit())
+    signal.signal(signal.SIGTERM, lambda *args: app.quit())
+    core.start()
+    code = app.exec_()
+    core.close()
+    log.close()
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(runHeadless(sys.argv))
@@ -0,0 +1,73 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import random
+import zlib
+
+
+class PollSchedule:
+    """Распределение запросов к адресам по времени периода опроса.
+
+    Каждый адрес получает постоянный сдвиг фазы внутри доли spread
+    периода (по контрольной сумме адреса), к которому добавляется
+    небольшое случайное отклонение. Адрес может иметь свой период
+    опроса; время следующего запроса каждого адреса хранится между
+    раундами.
+
+    Запросы начинаются не позже, чем за время ожидания ответа до конца
+    периода, поэтому раунды не перекрываются, если запросы не ждут
+    в очереди за ограничением одновременных запросов; ответы, всё же
+    пришедшие после начала следующего раунда, Observer относит к своему
+    раунду по ключу запроса."""
+
+    def __init__(self, spread=0.8, jitter=0.02):
+        """Инициализация:
+
+        spread - доля периода, по которой распределяются запросы;
+
+        jitter - доля периода для случайного отклонения."""
+        self.spread = spread
+        self.jitter = jitter
+        # Адрес -> время следующего запроса (секунды эпохи).
+        self.next = {}
+
+    def phase(self, address):
+        """Постоянный сдвиг адреса в долях от 0 до 1."""
+        return zlib.crc32(address.encode('utf-8')) / 0x100000000
+
+    def plan(self, addresses, periods, begin, period, timeout=0):
+        """Составить план запросов раунда, начинающегося в begin
+        (секунды эпохи) и длящегося period секунд.
+
+        periods - словарь периодов опроса адресов в секундах;
+
+        timeout - наибольшее время ожидания ответа в секундах: запросы,
+        время которых наступает позже period - timeout, переносятся
+        в следующий раунд.
+
+        Возвращает список (адрес, задержка от начала раунда в секундах)."""
+        # Последнее время начала запроса с учётом случайного отклонения.
+        last = begin + max(0.0, period - timeout - self.jitter * period)
+        window = min(self.spread * period, last - begin)
+        result = []
+        for address in addresses:
+            own = periods.get(address) or period
+            due = self.next.get(address)
+            if due is None or due < begin - own:
+                # Новый адрес или опрос долго не выполнялся.
+                due = begin + self.phase(address) * min(window, own)
+            while due <= last:
+                delay = max(0.0, due - begin)
+                delay += random.uniform(0, self.jitter * period)
+                result.append((address, delay))
+                due += own
+            self.next[address] = due
+        result.sort(key=lambda item: item[1])
+        return result
+
+    def forget(self, addresses):
+        """Удалить адреса, которых больше нет в списке."""
+        for address in list(self.next):
+            if address not in addresses:
+                del self.next[address]
@@ -0,0 +1,87 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import sys
+from array import array
+
+
+class Batch:
+    """Показания одного ответа модуля.
+
+    Параллельные массивы: адреса датчиков, значения строкой (как их
+    прислал модуль) и числом (nan, если значение не число). Пакет
+    передаётся из потока опроса сигналом целиком, без копирования."""
+    __slots__ = ('addresses', 'texts', 'values', 'malformed')
+
+    def __init__(self):
+        """Инициализация пустого пакета."""
+        self.addresses = []
+        self.texts = []
+        self.values = array('d')
+        # Количество строк не в формате 'адрес значение'.
+        self.malformed = 0
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def append(self, address, text, value):
+        """Добавить показание датчика address."""
+        self.addresses.append(address)
+        self.texts.append(text)
+        self.values.append(value)
+
+    def rows(self):
+        """Перебрать показания: (адрес, значение строкой, значение)."""
+        return zip(self.addresses, self.texts, self.values)
+
+
+class Parser:
+    """Потоковый разбор ответа модуля.
+
+    Ответ - строки 'адрес значение', разделённые '\\n' или '\\r\\n'.
+    Данные передаются в feed по мере получения частями любого размера,
+    строки разбираются сразу, в памяти хранится только незавершённая
+    строка."""
+
+    def __init__(self, encoding='latin-1'):
+        """Инициализация разбора ответа в кодировке encoding."""
+        self.encoding = encoding
+        self.batch = Batch()
+        self.tail = b''
+
+    def feed(self, data):
+        """Разобрать очередную часть ответа (bytes)."""
+        if not data:
+            return
+        lines = (self.tail + data).split(b'\n')
+        self.tail = lines.pop()
+        for line in lines:
+            self.line(line)
+
+    def close(self):
+        """Разобрать последнюю строку и вернуть пакет."""
+        if self.tail:
+            self.line(self.tail)
+            self.tail = b''
+        return self.batch
+
+    def line(self, line):
+        """Разобрать одну строку."""
+        line = line.rstrip(b'\r')
+        if not line.strip():
+            # Пустые строки разделяют ответ и ошибкой не считаются.
+            return
+        temp = line.split(b' ')
+        if len(temp) != 2 or not temp[0]:
+            self.batch.malformed += 1
+            return
+        address, text = temp
+        try:
+            value = float(text)
+        except ValueError:
+            value = float('nan')
+        self.batch.append(
+            sys.intern(address.decode(self.encoding, 'replace')),
+            text.decode(self.encoding, 'replace'),
+            value)
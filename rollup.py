@@ -0,0 +1,249 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import math
+import os
+import numpy as np
+
+import dayFile
+
+# Длины интервалов сводов в секундах: 1 мин, 15 мин, 1 ч.
+RESOLUTIONS = (60, 900, 3600)
+
+# Запись файла свода суток Y.M.D.rN (N - длина интервала в секундах):
+# начало интервала (секунды эпохи), номер датчика в словаре Y.M.D.rids,
+# количество значений, минимум, максимум и среднее.
+RECORD = np.dtype([
+    ('time', '<f8'), ('id', '<u4'), ('count', '<u4'),
+    ('min', '<f8'), ('max', '<f8'), ('mean', '<f8')
+])
+
+
+def extension(resolution):
+    """Расширение файла свода с интервалом resolution секунд."""
+    return '.r{}'.format(resolution)
+
+
+def choose(span, width, resolutions=RESOLUTIONS):
+    """Выбрать самый грубый свод, у которого на интервал span секунд
+    приходится не меньше width значений (точек по ширине графика).
+
+    Возвращает длину интервала свода или None, если нужны исходные
+    значения."""
+    result = None
+    for resolution in resolutions:
+        if span / resolution >= width:
+            result = resolution
+    return result
+
+
+def reduce(times, values, origin, resolution):
+    """Свести значения в интервалы по resolution секунд от origin.
+
+    Пропуски (NaN) не учитываются. Возвращает массивы начала
+    интервалов, минимумов, максимумов, средних и количеств значений."""
+    valid = ~np.isnan(values)
+    times = times[valid]
+    values = values[valid]
+    if len(times) == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty, empty, empty, np.empty(0, dtype=np.int64)
+    buckets = ((times - origin) // resolution).astype(np.int64)
+    order = np.argsort(buckets, kind='stable')
+    buckets = buckets[order]
+    values = values[order]
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    counts = np.diff(np.append(starts, len(buckets)))
+    return (
+        origin + buckets[starts] * resolution,
+        np.minimum.reduceat(values, starts),
+        np.maximum.reduceat(values, starts),
+        np.add.reduceat(values, starts) / counts,
+        counts)
+
+
+def complete(base, resolutions=RESOLUTIONS):
+    """Проверить, есть ли у суток base полные файлы сводов resolutions.
+
+    Пока своды суток ведутся, рядом лежит файл Y.M.D.ropen; если он
+    остался после аварийного завершения, незавершённые интервалы
+    потеряны и своды неполны."""
+    return all(
+        os.path.exists(base + extension(resolution))
+        for resolution in resolutions) and \
+        os.path.exists(base + '.rids') and \
+        not os.path.exists(base + '.ropen')
+
+
+def has(base, resolution):
+    """Проверить, есть ли у суток base полный файл свода resolution."""
+    return complete(base, (resolution,))
+
+
+def read(base, resolution):
+    """Считать свод суток base с интервалом resolution секунд.
+
+    Записи одного интервала (свод дописывался после перезапуска
+    или опоздавшего ответа) объединяются. Возвращает словари
+    адрес -> (начало интервала, минимум, максимум, среднее, количество)
+    и адрес -> имя."""
+    ids = dayFile.readIds(base + '.rids')
+    path = base + extension(resolution)
+    count = os.path.getsize(path) // RECORD.itemsize
+    records = np.fromfile(path, dtype=RECORD, count=count)
+    records = records[records['id'] < len(ids)]
+    series = {}
+    names = {}
+    if len(records) == 0:
+        return series, names
+    records = records[np.lexsort((records['time'], records['id']))]
+    key = np.stack((records['id'], records['time']))
+    starts = np.flatnonzero(
+        np.any(np.diff(key, axis=1, prepend=-1), axis=0))
+    counts = np.add.reduceat(records['count'].astype(np.int64), starts)
+    sums = np.add.reduceat(records['mean'] * records['count'], starts)
+    numbers = records['id'][starts]
+    merged = (
+        records['time'][starts],
+        np.minimum.reduceat(records['min'], starts),
+        np.maximum.reduceat(records['max'], starts),
+        sums / np.maximum(counts, 1),
+        counts)
+    bounds = np.flatnonzero(np.diff(numbers)) + 1
+    for chunk in np.split(np.arange(len(numbers)), bounds):
+        address, name = ids[numbers[chunk[0]]]
+        series[address] = tuple(column[chunk] for column in merged)
+        names[address] = name
+    return series, names
+
+
+class Rollups:
+    """Своды показаний суток по интервалам RESOLUTIONS, обновляемые
+    при записи данных.
+
+    Для каждого датчика и длины интервала хранится незавершённый
+    интервал; он записывается в файл, когда приходит значение
+    следующего интервала, и при закрытии файлов."""
+
+    def __init__(self, resolutions=RESOLUTIONS):
+        """Инициализация без открытых файлов."""
+        self.resolutions = resolutions
+        self.midnight = None
+        self.base = None
+        self.files = {}
+        self.fileIds = None
+        self.ids = {}
+        self.newIds = []
+        # Длина интервала -> номер датчика -> [начало, мин, макс, сумма,
+        # количество].
+        self.buckets = {resolution: {} for resolution in resolutions}
+        self.records = {resolution: [] for resolution in resolutions}
+
+    def open(self, base, midnight, fresh=True, series=None, names=None):
+        """Открыть файлы сводов суток base (начало суток midnight).
+
+        fresh - данных суток ещё нет. Если своды начатых суток неполны
+        (см. complete), они строятся заново из уже записанных данных
+        series, names."""
+        self.midnight = midnight
+        self.base = base
+        self.ids = {}
+        append = not fresh and complete(base, self.resolutions)
+        # Отметка: своды ведутся, незавершённые интервалы в памяти.
+        open(base + '.ropen', 'w').close()
+        if append:
+            for address, name in dayFile.readIds(base + '.rids'):
+                self.ids[address] = len(self.ids)
+            for resolution in self.resolutions:
+                file = open(base + extension(resolution), 'ab')
+                # Отбросить незавершённую запись.
+                size = file.tell()
+                if size % RECORD.itemsize:
+                    file.truncate(size - size % RECORD.itemsize)
+                self.files[resolution] = file
+            self.fileIds = open(base + '.rids', 'a', encoding='utf-8')
+            return
+        for resolution in self.resolutions:
+            self.files[resolution] = open(base + extension(resolution), 'wb')
+        self.fileIds = open(base + '.rids', 'w', encoding='utf-8')
+        if series:
+            self.rebuild(series, names)
+
+    def rebuild(self, series, names):
+        """Записать своды данных series, полученных из файлов суток."""
+        for address, (times, values) in series.items():
+            number = len(self.ids)
+            self.ids[address] = number
+            self.newIds.append('{};{}\n'.format(address, names[address]))
+            for resolution in self.resolutions:
+                starts, low, high, means, counts = reduce(
+                    times, values, self.midnight, resolution)
+                self.records[resolution].extend(zip(
+                    starts.tolist(), [number] * len(starts),
+                    counts.tolist(), low.tolist(), high.tolist(),
+                    means.tolist()))
+        self.flush()
+
+    def add(self, address, name, stamp, value):
+        """Учесть значение value датчика address во время stamp."""
+        if self.fileIds is None or math.isnan(value):
+            return
+        number = self.ids.get(address)
+        if number is None:
+            number = len(self.ids)
+            self.ids[address] = number
+            self.newIds.append('{};{}\n'.format(address, name))
+        offset = stamp - self.midnight
+        for resolution in self.resolutions:
+            start = self.midnight + offset // resolution * resolution
+            buckets = self.buckets[resolution]
+            bucket = buckets.get(number)
+            if bucket is None or bucket[0] != start:
+                if bucket is not None:
+                    self.finish(resolution, number, bucket)
+                buckets[number] = [start, value, value, value, 1]
+            else:
+                if value < bucket[1]:
+                    bucket[1] = value
+                if value > bucket[2]:
+                    bucket[2] = value
+                bucket[3] += value
+                bucket[4] += 1
+
+    def finish(self, resolution, number, bucket):
+        """Завершить интервал bucket датчика number."""
+        start, low, high, total, count = bucket
+        self.records[resolution].append(
+            (start, number, count, low, high, total / count))
+
+    def flush(self):
+        """Записать завершённые интервалы в файлы."""
+        if self.newIds:
+            self.fileIds.write(''.join(self.newIds))
+            self.newIds.clear()
+            self.fileIds.flush()
+        for resolution, records in self.records.items():
+            if records:
+                self.files[resolution].write(
+                    np.array(records, dtype=RECORD).tobytes())
+                records.clear()
+                self.files[resolution].flush()
+
+    def close(self):
+        """Завершить все интервалы, записать их и закрыть файлы."""
+        try:
+            for resolution, buckets in self.buckets.items():
+                for number, bucket in buckets.items():
+                    self.finish(resolution, number, bucket)
+                buckets.clear()
+            if self.fileIds is not None:
+                self.flush()
+                # Все интервалы записаны: своды суток полны.
+                os.remove(self.base + '.ropen')
+        finally:
+            for file in list(self.files.values()) + [self.fileIds]:
+                if file is not None:
+                    file.close()
+            self.files = {}
+            self.fileIds = None
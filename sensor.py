@@ -2,20 +2,114 @@
 
 # !/usr/bin/env python3
 
+import sys
+
 
 class Sensor:
-    """description of class"""
-    # address = ''
-    # group = ''
-    # name = ''
-    # value = 0
-
-    def __init__(self, address, group, name='No name', value=None):
-        """__init__(address, group, name='No name', value=None)"""
+    """Датчик: номер в реестре, адрес, группа, имя, последнее значение
+    (число или None, если значения ещё нет) и его текст в ответе модуля."""
+    __slots__ = ('id', 'address', 'group', 'name', 'value', 'text')
+
+    def __init__(self, address, group, name='No name', value=None, id=-1):
+        """__init__(address, group, name='No name', value=None, id=-1)"""
+        self.id = id
         self.address = address
         self.name = name
         self.value = value
+        self.text = ''
         self.group = group
 
     def print(self):
         print(self.value)
+
+
+class SensorRegistry:
+    """Реестр датчиков: единый поиск датчиков по адресу и по группе.
+
+    Датчики получают номера по порядку добавления, адреса, имена
+    и группы хранятся интернированными строками. Реестр ведёт себя как
+    словарь адрес -> Sensor в порядке добавления."""
+
+    def __init__(self):
+        """Инициализация пустого реестра."""
+        # Датчики по номерам.
+        self.list = []
+        self.addresses = {}
+        # Группа -> словарь адрес -> Sensor (порядок файла датчиков).
+        self.groups = {}
+
+    def __len__(self):
+        return len(self.list)
+
+    def __iter__(self):
+        return iter(self.addresses)
+
+    def __contains__(self, address):
+        return address in self.addresses
+
+    def __getitem__(self, address):
+        return self.addresses[address]
+
+    def get(self, address, default=None):
+        """Датчик с адресом address или default."""
+        return self.addresses.get(address, default)
+
+    def keys(self):
+        return self.addresses.keys()
+
+    def items(self):
+        return self.addresses.items()
+
+    def values(self):
+        return self.addresses.values()
+
+    def clear(self):
+        """Удалить все датчики."""
+        self.list.clear()
+        self.addresses.clear()
+        self.groups.clear()
+
+    def add(self, address, group, name='No name'):
+        """Добавить датчик или изменить группу и имя существующего.
+
+        Возвращает датчик."""
+        group = sys.intern(group)
+        name = sys.intern(name)
+        ss = self.addresses.get(address)
+        if ss is None:
+            address = sys.intern(address)
+            ss = Sensor(address, group, name, id=len(self.list))
+            self.list.append(ss)
+            self.addresses[address] = ss
+        else:
+            if ss.group != group:
+                del self.groups[ss.group][address]
+                ss.group = group
+            ss.name = name
+        self.groups.setdefault(group, {})[ss.address] = ss
+        return ss
+
+    def remove(self, addresses):
+        """Удалить датчики с адресами addresses.
+
+        Номера оставшихся датчиков пересчитываются по порядку."""
+        for address in addresses:
+            ss = self.addresses.pop(address, None)
+            if ss is not None:
+                del self.groups[ss.group][address]
+        self.list = list(self.addresses.values())
+        for number, ss in enumerate(self.list):
+            ss.id = number
+
+    def group(self, group):
+        """Словарь адрес -> Sensor датчиков группы group."""
+        return self.groups.get(group, {})
+
+    def names(self):
+        """Словарь адрес -> имя датчика."""
+        return {ss.address: ss.name for ss in self.list}
+
+    def reset(self):
+        """Сбросить значения всех датчиков перед раундом опроса."""
+        for ss in self.list:
+            ss.value = None
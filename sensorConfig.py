@@ -0,0 +1,142 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import os
+import threading
+
+# Разобранные папки датчиков по путям, общие для всех потоков.
+cache = {}
+# Разобранные файлы групп: (папка, группа) -> (время изменения, размер,
+# адрес -> имя, ключи графиков, имя -> номер графика).
+files = {}
+lock = threading.Lock()
+
+
+def signature(path):
+    """Имена, время изменения и размеры файлов папки path."""
+    items = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                items.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(items))
+
+
+def load(path):
+    """Вернуть настройки датчиков папки path.
+
+    Если изменился список файлов, время изменения или размер одного
+    из них, создаётся новый объект, но заново разбираются только
+    изменённые файлы; иначе возвращается ранее разобранный объект."""
+    with lock:
+        stamp = signature(path)
+        config = cache.get(path)
+        if config is None or config.signature != stamp:
+            config = SensorConfig(path, stamp)
+            cache[path] = config
+            # Забыть удалённые файлы.
+            names = {fileName for fileName, mtime, size in stamp}
+            for key in [
+                key for key in files
+                if key[0] == path and key[1] not in names
+            ]:
+                del files[key]
+        return config
+
+
+def readGroup(path, group):
+    """Разобрать файл группы group папки path.
+
+    Возвращает словарь адрес -> имя в порядке файла, множество ключей
+    графиков (адресов и имён) и, для группы энергопотребления, словарь
+    имя -> номер графика (строка файла)."""
+    sensors = {}
+    keys = set()
+    panels = {}
+    number = 0
+    with open('{}/{}'.format(path, group), 'r', encoding="utf-8") as file:
+        for line in file:
+            line = line.replace('\n', '')
+            line = line.replace(' = ', '=')
+            temp = line.split('=')
+            if not temp[0]:
+                continue
+            keys.add(temp[0])
+            if len(temp) > 1:
+                name = temp[1]
+                keys.add(name)
+                if group == 'consumtion':
+                    panels.setdefault(name, number)
+            else:
+                name = 'No name'
+            sensors[temp[0]] = name
+            number += 1
+    return sensors, keys, panels
+
+
+def readAddresses(path):
+    """Считать файл адресов модулей со строками 'адрес = имя'
+    и необязательным периодом опроса 'адрес = имя = секунды'.
+
+    Возвращает словари адрес -> имя и адрес -> период."""
+    names = {}
+    periods = {}
+    with open(path, 'r', encoding="utf-8") as file:
+        for line in file:
+            line = line.replace('\n', '')
+            line = line.replace(' = ', '=')
+            temp = line.split('=')
+            if not temp[0]:
+                continue
+            if len(temp) > 1:
+                names[temp[0]] = temp[1]
+            else:
+                names[temp[0]] = 'No name'
+            if len(temp) > 2 and temp[2].isdigit():
+                periods[temp[0]] = int(temp[2])
+    return names, periods
+
+
+class SensorConfig:
+    """Настройки датчиков: файлы папки датчиков, по одному на группу,
+    со строками 'адрес = имя'.
+
+    После создания объект не изменяется, поэтому его можно читать
+    из нескольких потоков и передавать в процессы рисования."""
+
+    def __init__(self, path, signature=()):
+        """Считать файлы папки path; signature - состояние файлов,
+        по которому load определяет изменения."""
+        self.path = path
+        self.signature = signature
+        # Группа -> словарь адрес -> имя в порядке файла.
+        self.groups = {}
+        # Группа -> множество адресов и имён (ключей графиков) датчиков.
+        self.keys = {}
+        # Имя датчика энергопотребления -> номер графика (строка файла).
+        self.panels = {}
+        for fileName, mtime, size in signature:
+            self.read(fileName, mtime, size)
+
+    def read(self, group, mtime=None, size=None):
+        """Добавить файл группы group.
+
+        Файл с временем изменения mtime и размером size, уже разобранный
+        для прежнего объекта, повторно не читается (см. load)."""
+        key = (self.path, group)
+        item = files.get(key)
+        if mtime is None or item is None or item[:2] != (mtime, size):
+            item = (mtime, size) + readGroup(self.path, group)
+            if mtime is not None:
+                files[key] = item
+        mtime, size, sensors, keys, panels = item
+        self.groups[group] = sensors
+        self.keys[group] = keys
+        for name, number in panels.items():
+            self.panels.setdefault(name, number)
+
+    def group(self, group):
+        """Множество ключей графиков группы group."""
+        return self.keys.get(group, set())
@@ -0,0 +1,130 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import math
+from PyQt5.QtCore import (
+    Qt, QAbstractTableModel, QBasicTimer, QModelIndex, QSortFilterProxyModel
+)
+
+
+class SensorModel(QAbstractTableModel):
+    """Модель таблицы датчиков.
+
+    Строки - датчики реестра sensors (sensor.SensorRegistry) в порядке
+    номеров. Изменения
+    собираются и применяются не чаще одного раза за interval мс, сигнал
+    dataChanged отправляется только для изменившихся строк."""
+
+    def __init__(self, sensors, interval=250, parent=None):
+        """Инициализация модели с реестром датчиков sensors."""
+        super().__init__(parent)
+        self.sensors = sensors
+        self.interval = interval
+        self.headers = ['Val', 'Name', 'Address']
+        self.keys = []
+        # Показанные значения строк: (значение, имя).
+        self.rows = []
+        self.timer = QBasicTimer()
+
+    def rowCount(self, parent=QModelIndex()):
+        """Количество строк."""
+        if parent.isValid():
+            return 0
+        return len(self.keys)
+
+    def columnCount(self, parent=QModelIndex()):
+        """Количество столбцов."""
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Данные ячейки."""
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        column = index.column()
+        if column == 2:
+            return self.keys[index.row()]
+        return self.rows[index.row()][column]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """Заголовки столбцов."""
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def update(self):
+        """Отметить, что данные датчиков изменились."""
+        if not self.timer.isActive():
+            self.timer.start(self.interval, self)
+
+    def timerEvent(self, event):
+        """Событие таймера: применить накопленные изменения."""
+        if event.timerId() == self.timer.timerId():
+            self.timer.stop()
+            self.refresh()
+        else:
+            super().timerEvent(event)
+
+    def refresh(self):
+        """Сравнить датчики с показанными строками и сообщить
+        представлениям об изменениях."""
+        keys = [ss.address for ss in self.sensors.list]
+        count = len(self.keys)
+        if keys[:count] != self.keys:
+            # Список датчиков перечитан.
+            self.beginResetModel()
+            self.keys = keys
+            self.rows = [self.row(i) for i in range(len(keys))]
+            self.endResetModel()
+            return
+        if len(keys) > count:
+            self.beginInsertRows(QModelIndex(), count, len(keys) - 1)
+            self.keys = keys
+            self.rows.extend(self.row(i) for i in range(count, len(keys)))
+            self.endInsertRows()
+
+        # Отправить dataChanged для непрерывных участков изменённых строк.
+        first = None
+        for i in range(count):
+            row = self.row(i)
+            if row != self.rows[i]:
+                self.rows[i] = row
+                if first is None:
+                    first = i
+            elif first is not None:
+                self.changed(first, i - 1)
+                first = None
+        if first is not None:
+            self.changed(first, count - 1)
+
+    def row(self, number):
+        """Значения строки датчика с номером number."""
+        ss = self.sensors.list[number]
+        value = ss.value
+        if value is not None and math.isnan(value):
+            # Нечисловое показание показывается так, как его прислал модуль.
+            value = ss.text
+        return value, ss.name
+
+    def changed(self, first, last):
+        """Сообщить об изменении строк с first по last."""
+        self.dataChanged.emit(
+            self.index(first, 0),
+            self.index(last, len(self.headers) - 1),
+            [Qt.DisplayRole])
+
+
+class SensorFilter(QSortFilterProxyModel):
+    """Датчики с полученными значениями, отсортированные по имени."""
+
+    def __init__(self, parent=None):
+        """Инициализация фильтра."""
+        super().__init__(parent)
+        self.setDynamicSortFilter(True)
+        self.sort(1)
+
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        """Показывать только датчики со значением."""
+        return self.sourceModel().rows[sourceRow][0] is not None
@@ -0,0 +1,229 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+# Проверка очереди и потока отправки имейлов с локальной заменой
+# сервера SMTP. Запуск: python -m unittest discover tests
+
+import os
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Поток отправки работает и без PyQt5.
+os.environ.setdefault('OBSERVER_HEADLESS', '1')
+
+import dayFile
+import mailQueue
+import threadMail
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """Сеанс SMTP: принимает письма и записывает их в сервер."""
+
+    def reply(self, text):
+        self.wfile.write((text + '\r\n').encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.sessions += 1
+        self.reply('220 localhost ready')
+        recipients = []
+        for line in self.rfile:
+            command = line.decode().rstrip('\r\n')
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                if server.auth:
+                    self.reply('250-localhost')
+                    self.reply('250 AUTH PLAIN LOGIN')
+                else:
+                    self.reply('250 localhost')
+            elif verb == 'AUTH':
+                with server.lock:
+                    server.logins += 1
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command[command.find('<') + 1:command.rfind('>')]
+                if address in server.rejected:
+                    self.reply('550 No such user')
+                elif address in server.deferred:
+                    self.reply('450 Mailbox busy')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                for line in self.rfile:
+                    if line == b'.\r\n':
+                        break
+                with server.lock:
+                    server.messages.extend(recipients)
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('502 Command not implemented')
+
+
+class Server(socketserver.ThreadingTCPServer):
+    """Локальная замена сервера SMTP."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, auth=False, rejected=(), deferred=()):
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.lock = threading.Lock()
+        self.auth = auth
+        self.rejected = set(rejected)
+        self.deferred = set(deferred)
+        self.sessions = 0
+        self.logins = 0
+        self.messages = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TestMailQueue(unittest.TestCase):
+    """Очередь отправки отчётов."""
+
+    # Записи об отправленных отчётах старше days суток не хранятся.
+    day = datetime.now().strftime('%Y.%m.%d')
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_dedup(self):
+        queue = mailQueue.MailQueue(self.path)
+        key = ('a@b', self.day, 'C', '10:00')
+        self.assertTrue(queue.add(*key))
+        self.assertFalse(queue.add(*key))
+        # Очередь хранится на диске.
+        queue = mailQueue.MailQueue(self.path)
+        self.assertFalse(queue.add(*key))
+        queue.delivered(key)
+        self.assertFalse(queue.add(*key))
+        self.assertFalse(mailQueue.MailQueue(self.path).add(*key))
+
+    def test_backoff_and_drop(self):
+        queue = mailQueue.MailQueue(
+            self.path, delay=60, maxDelay=100, attempts=3)
+        key = ('a@b', self.day, 'P', '10:00')
+        queue.add(*key)
+        self.assertEqual(queue.failed(key), 60)
+        self.assertEqual(queue.failed(key), 100)
+        self.assertEqual(queue.due(), [])
+        self.assertIsNone(queue.failed(key))
+        self.assertNotIn(key, queue.queue)
+        self.assertIsNone(queue.next())
+
+
+class TestThreadMail(unittest.TestCase):
+    """Отправка отчётов потоком ThreadMail."""
+
+    day = datetime.now().strftime('%Y.%m.%d')
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+        shutil.rmtree(self.path)
+
+    def start(self, flag='plain', **kwargs):
+        """Запустить сервер и создать поток отправки через него.
+
+        Сервер не поддерживает STARTTLS, поэтому по умолчанию в настройках
+        задан флаг plain."""
+        server = Server(**kwargs)
+        self.servers.append(server)
+        config = os.path.join(self.path, 'emails')
+        with open(config, 'w') as file:
+            file.write('user;password;127.0.0.1;{};{}\n'.format(
+                server.server_address[1], flag))
+        mail = threadMail.ThreadMail(config, os.path.join(
+            self.path, 'mail{}'.format(len(self.servers))))
+        mail.set_path(os.path.join(self.path, 'data'))
+        date = datetime.strptime(self.day, '%Y.%m.%d')
+        with open(dayFile.path(mail.pathData, date) + '.pdf', 'wb') as file:
+            file.write(b'%PDF-1.4\n')
+        self.failures = []
+        mail.mailFailed.connect(
+            lambda text, begin, delta: self.failures.append(text))
+        return server, mail
+
+    def test_one_session_per_run(self):
+        server, mail = self.start()
+        for number in range(5):
+            mail.queue.add('r{}@b'.format(number), self.day, 'C', '10:00')
+        mail.run()
+        self.assertEqual(server.sessions, 1)
+        self.assertEqual(len(server.messages), 5)
+        self.assertEqual(mail.queue.due(), [])
+
+    def test_no_plaintext_login(self):
+        # Без STARTTLS и флага plain сеанс не открывается.
+        server, mail = self.start(flag='', auth=True)
+        mail.queue.add('r@b', self.day, 'C', '10:00')
+        mail.run()
+        self.assertEqual(server.logins, 0)
+        self.assertEqual(server.messages, [])
+        self.assertEqual(len(mail.queue.queue), 1)
+        # С флагом plain письмо отправляется, но без входа.
+        server, mail = self.start(auth=True)
+        mail.queue.add('r@b', self.day, 'C', '10:00')
+        mail.run()
+        self.assertEqual(server.logins, 0)
+        self.assertEqual(server.messages, ['r@b'])
+
+    def test_drop_after_attempts(self):
+        server, mail = self.start(deferred={'busy@b'})
+        mail.queue.delay = 0
+        mail.queue.attempts = 2
+        mail.queue.add('busy@b', self.day, 'C', '10:00')
+        mail.queue.add('good@b', self.day, 'C', '10:00')
+        mail.run()
+        self.assertEqual(server.messages, ['good@b'])
+        self.assertEqual(list(mail.queue.queue), [
+            ('busy@b', self.day, 'C', '10:00')])
+        mail.run()
+        self.assertEqual(mail.queue.queue, {})
+        self.assertIn('Email to busy@b is dropped!', self.failures)
+        # Отправленный отчёт повторно не отправляется.
+        mail.queue.add('good@b', self.day, 'C', '10:00')
+        mail.run()
+        self.assertEqual(server.messages, ['good@b'])
+        self.assertEqual(server.sessions, 2)
+
+    def test_refused_is_permanent(self):
+        server, mail = self.start(rejected={'bad@b'})
+        mail.queue.add('bad@b', self.day, 'C', '10:00')
+        mail.queue.add('good@b', self.day, 'C', '10:00')
+        mail.run()
+        self.assertEqual(server.messages, ['good@b'])
+        self.assertEqual(mail.queue.queue, {})
+        self.assertIn('Email to bad@b is refused!', self.failures)
+        self.assertEqual(server.sessions, 1)
+
+if __name__ == '__main__':
+    unittest.main()
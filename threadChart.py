@@ -3,15 +3,14 @@
 
 # !/usr/bin/env python3
 
-from PyQt5 import QtCore
-import requests
+from headless import QtCore
 from datetime import datetime
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib import colors
-from matplotlib.backends.backend_pdf import PdfPages
 import os
 
+import dayFile
+import sensorConfig
+
 
 class ThreadChart(QtCore.QThread):
     """Поток для рисования графика."""
@@ -21,215 +20,161 @@ class ThreadChart(QtCore.QThread):
         """Инициализация потока."""
         super().__init__()
 
-        self.cssColors = ('#000000', '#0000AA', '#00AA00', '#00AAAA', '#AA0000',
-             '#AA00AA', '#AA5500', '#555555', '#5555FF', '#55FF55',
-             '#55FFFF', '#FF5555', '#FF55FF', '#FFFF55'
-        )
+        # Страницы графиков текущих суток.
+        self.pages = None
+        # Рисовать страницы параллельно в пуле процессов.
+        self.parallel = True
+        self.executor = None
+
+        # Данные, прочитанные из файла при предыдущем запуске.
+        self.cachePath = None
+        self.cacheOffset = 0
+        self.cacheSeries = {}
+        self.cacheNames = {}
+
+    def set_path(self, pathData, currentDate, series=None, names=None,
+                 pathSensors='config/sensors'):
+        """Установка пути к файлу графика.
 
-    def set_path(self, pathData, currentDate):
-        """Установка пути к файлу графика."""
+        series - данные суток из хранилища (адрес -> (время, значения)),
+        если не заданы, данные читаются из файла;
+
+        names - имена датчиков по адресам;
+
+        pathSensors - папка файлов датчиков."""
         self.pathData = '{0}\\{1}\\{2}\\{3}'.format(
             pathData,
             currentDate.strftime('%Y'),
             currentDate.strftime('%m'),
             currentDate.strftime('%d'))
         self.name = currentDate.strftime('%Y.%m.%d')
+        self.date = datetime(
+            currentDate.year, currentDate.month, currentDate.day)
+        self.series = series
+        self.names = names or {}
+        self.pathSensors = pathSensors
 
     def run(self):
         """Основная функция потока."""
+        # matplotlib загружается при первом рисовании графика.
+        import chartPages
 
-        # Считать адреса датчиков из файлов.
-        sensorsList = dict()
-        pathSensors = "config/sensors"
-        if os.path.exists(pathSensors):
-            fileList = os.listdir(pathSensors)
-            for fileName in fileList:
-                sensorsList[fileName] = list()
-                with open(
-                    '{}/{}'.format(pathSensors, fileName),
-                    'r',
-                    encoding="utf-8"
-                ) as file:
-                    for line in file:
-                        line = line.replace('\n', '')
-                        line = line.replace(' = ', '=')
-                        temp = line.split('=')
-                        sensorsList[fileName].append(temp[0])
-                        if len(temp) > 1:
-                            name = temp[1]
-                            sensorsList[fileName].append(temp[1])
-
-        sensors = {}
+        # Настройки датчиков, общие с Observer: файлы разбираются
+        # заново только после их изменения.
+        try:
+            config = sensorConfig.load(self.pathSensors)
+        except OSError:
+            config = sensorConfig.SensorConfig(self.pathSensors)
 
         # Считать данные датчиков из файла.
-        path = '{}\\{}.csv'.format(self.pathData, self.name)
-        if os.path.exists(path):
+        base = '{}\\{}'.format(self.pathData, self.name)
+        path = base + '.csv'
+        if self.series is not None or os.path.exists(path) or \
+                os.path.exists(base + '.bin'):
             try:
-                with open(path, 'r') as file:
-                    for line in file:
-                        line = line.replace('\n', '')
-                        temp = line.split(';')
-                        if len(temp[1]) >= 4:
-                            t = temp[0].split(':')
-                            time = float(t[0]) + float(
-                                int(t[1]) * 60 + int(t[2])
-                            ) / 3600
-                            if temp[2] != 'No name':
-                                name = temp[2]
-                                description = '{} ({})'.format(temp[2], temp[1][-4:])
-                            else:
-                                name = temp[1]
-                                description = temp[1]
-                            try:
-                                value = float(temp[3])
-                            except ValueError:
-                                # Пропуск данных в случае ошибки.
-                                value = float('Inf')
-                            if name in sensors:
-                                # Добавление пропуска если нет данных
-                                # в течении пяти минут ().
-                                if time - sensors[name][0][-1] > 5.0/60.0:
-                                    sensors[name][0].append(time - 0.08)
-                                    sensors[name][1].append(float('Inf'))
-                                sensors[name][0].append(time)
-                                sensors[name][1].append(value)
-                            else:
-                                sensors[name] = [[time], [value], description]
-
-                with PdfPages('{}\\{}.pdf'.format(self.pathData, self.name)) as pdf:
-                
-                    fig = plt.figure(figsize=(10, 15), dpi=128)
-                    # График температур
-                    fig1 = fig.add_subplot(111)
-
-                    fig1.set_title(self.name, loc='left')
-                    fig1.set_title('Температура', fontsize=20)
-                    fig1.set_xticks(range(0, 25))
-                    fig1.set_xlim(0, 24)
-                    fig1.set_xlabel('Время')
-                    fig1.set_ylabel('°C')
-                    fig1.grid(True, which='major', color='grey')
-                    fig1.grid(True, which='minor', color='lightgrey')
-
-                    # Отрисовка графика температур.
-                    iclr = 0
-                    keycount = 0
-                    ymax = -100
-                    ymin = 100
-                    if 'temperature' in sensorsList:
-                        keys = list(sensors.keys())
-                        keys.sort()
-                        for key in keys:
-                            if key in sensorsList['temperature']:
-                                fig1.plot(
-                                    sensors[key][0],
-                                    sensors[key][1],
-                                    color=self.cssColors[iclr],
-                                    label=sensors[key][2],
-                                    alpha=1
-                                )
-                                t_max = max(sensors[key][1])
-                                t_min = min(sensors[key][1])
-                                if t_max > ymax:
-                                    ymax = t_max
-                                if t_min < ymin:
-                                    ymin = t_min
-                                iclr += 1
-                                keycount += 1
-                                if iclr == len(self.cssColors):
-                                    iclr = 0
-                        if keycount:
-                            fig1.legend(loc='upper center', bbox_to_anchor=(0.5, -0.1))
-
-                    plt.subplots_adjust(bottom=0.3)
-                    pdf.savefig(fig)
-                    plt.close()
-                    
-                    fig = plt.figure(figsize=(10, 15), dpi=128)
-                    plt.subplots_adjust(hspace=0.6)
-
-                    figs = [0]*6
-                    for i in range(6):
-                        figs[i] = fig.add_subplot(6, 1, i+1)
-
-                        # Настройки фигуры для графика энергопотребления.
-                        figs[i].set_title(self.name, loc='left')
-                        figs[i].set_xticks(range(0, 25))
-                        figs[i].set_xlim(0, 24)
-                        figs[i].set_xlabel('Время')
-                        figs[i].set_ylim(0, 2000)
-                        figs[i].set_ylabel('Вт')
-                        figs[i].grid(True, which='major', color='grey')
-                        figs[i].grid(True, which='minor', color='lightgrey')
-
-                        # Отрисовка графика энергопотребления.
-                        iclr = 0
-                        keycount = 0
-                        if 'consumtion' in sensorsList:
-                            keys = list(sensors.keys())
-                            keys.sort()
-                            for key in keys:
-                                if key in sensorsList['consumtion']:
-                                    if list(sensorsList['consumtion']).index(sensors[key][2].split('(')[0][:-1])//2 == i:
-                                        figs[i].plot(
-                                            sensors[key][0],
-                                            sensors[key][1],
-                                            color=self.cssColors[iclr],
-                                            label=sensors[key][2],
-                                            alpha=1
-                                        )
-                                        figs[i].set_title(sensors[key][2], fontsize=10)
-                                        iclr += 1
-                                        keycount += 1
-                                        if iclr == len(self.cssColors):
-                                            iclr = 0
-                    plt.subplots_adjust()
-                    pdf.savefig(fig)
-                    plt.close()
-
-                    fig = plt.figure(figsize=(10, 15), dpi=128)
-
-                    fig3 = fig.add_subplot(111)
-
-                    # Настройки фигуры для графика ресурсов компьютера.
-                    fig3.set_title(self.name, loc='left')
-                    fig3.set_title('Нагрузка', fontsize=20)
-                    fig3.set_xticks(range(0, 25))
-                    fig3.set_yticks(range(0, 110, 10))
-                    fig3.set_xlim(0, 24)
-                    fig3.set_ylim(0, 100)
-                    fig3.set_xlabel('Время')
-                    fig3.set_ylabel('%')
-                    fig3.grid(True, which='major', color='grey')
-                    fig3.grid(True, which='minor', color='lightgrey')
-                    # Отрисовка графика ресурсов.
-                    iclr = 0
-                    keycount = 0
-                    if 'resources' in sensorsList:
-                        keys = list(sensors.keys())
-                        keys.sort()
-                        for key in keys:
-                            if key in sensorsList['resources']:
-                                fig3.plot(
-                                    sensors[key][0],
-                                    sensors[key][1],
-                                    color=self.cssColors[iclr],
-                                    label=sensors[key][2],
-                                    alpha=1
-                                )
-                                iclr += 1
-                                keycount += 1
-                                if iclr == len(self.cssColors):
-                                    iclr = 0
-                        if keycount:
-                            fig3.legend(loc='upper center', bbox_to_anchor=(0.5, -0.1))
-
-                    plt.subplots_adjust(bottom=0.17)
-                    pdf.savefig(fig)
-                    plt.close()
-
-                    self.chartSaved.emit('Chart is saved to {}.pdf'.format(self.name))
+                if self.series is not None:
+                    series, names = self.series, self.names
+                elif dayFile.hasBinary(base):
+                    series, names = dayFile.group(*dayFile.readBinary(base))
+                else:
+                    series, names = self.readData(path)
+                items = chartPages.select(
+                    chartPages.prepare(series, names, self.date), config)
+
+                path = '{}\\{}.pdf'.format(self.pathData, self.name)
+                if not (self.parallel and chartPages.PdfWriter is not None and
+                        self.renderParallel(items, path)):
+                    if self.pages is None or self.pages.name != self.name:
+                        self.pages = chartPages.ChartPages(self.name)
+                    self.pages.update(items)
+                    self.pages.save(path)
+                self.chartSaved.emit('Chart is saved to {}.pdf'.format(self.name))
 
             except Exception as e:
                 print(e)
                 self.chartSaved.emit('Chart is not saved!')
+
+    def renderParallel(self, items, path):
+        """Нарисовать страницы в пуле процессов и объединить их в файл
+        path.
+
+        Возвращает False, если пул недоступен и страницы нужно нарисовать
+        в потоке."""
+        import chartPages
+        from concurrent.futures import wait
+        from concurrent.futures.process import BrokenProcessPool
+        if self.executor is None:
+            self.executor = chartPages.executor(len(items))
+        paths = [
+            '{}.{}.pdf'.format(path[:-4], index)
+            for index in range(len(items))
+        ]
+        futures = []
+        merged = False
+        try:
+            for index, pageItems in enumerate(items):
+                futures.append(self.executor.submit(
+                    chartPages.renderPage, self.name, index, pageItems,
+                    paths[index]))
+            for future in futures:
+                future.result()
+            chartPages.merge(paths, path)
+            merged = True
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            print(e)
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+            self.executor = None
+            return False
+        finally:
+            if not merged:
+                # Удалить файлы страниц, когда их рисование завершится.
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                for pagePath in paths:
+                    if os.path.exists(pagePath):
+                        os.remove(pagePath)
+        return True
+
+    def shutdown(self):
+        """Остановить пул процессов рисования."""
+        self.wait()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def readData(self, path):
+        """Считать данные датчиков из файла.
+
+        Разбирается только часть файла, дописанная после предыдущего
+        чтения; при смене файла или его уменьшении файл читается заново.
+        Возвращает словари адрес -> (время, значения) и адрес -> имя."""
+        size = os.path.getsize(path)
+        if path != self.cachePath or size < self.cacheOffset:
+            self.cachePath = path
+            self.cacheOffset = 0
+            self.cacheSeries = {}
+            self.cacheNames = {}
+        with open(path, 'rb') as file:
+            file.seek(self.cacheOffset)
+            data = file.read()
+        # Незавершённая последняя строка будет прочитана в следующий раз.
+        end = data.rfind(b'\n') + 1
+        try:
+            series, names = dayFile.parseCsv(
+                data[:end], self.date.timestamp())
+        except Exception:
+            self.cachePath = None
+            raise
+        for address, (times, values) in series.items():
+            if address in self.cacheSeries:
+                cache = self.cacheSeries[address]
+                self.cacheSeries[address] = (
+                    np.concatenate((cache[0], times)),
+                    np.concatenate((cache[1], values)))
+            else:
+                self.cacheSeries[address] = (times, values)
+                self.cacheNames[address] = names[address]
+        self.cacheOffset += end
+        return self.cacheSeries, self.cacheNames
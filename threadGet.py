@@ -2,61 +2,180 @@
 
 # !/usr/bin/env python3
 
-from PyQt5 import QtCore
-import requests
+from headless import QtCore
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 
+import responseParser
+
+
+class SessionPool:
+    """Общий для потоков пул HTTP-сессий с keep-alive по адресам."""
+    def __init__(self, size=256, idle=300):
+        """Инициализация пула:
+
+        size - максимальное количество хранимых сессий;
+
+        idle - время простоя в секундах, после которого сессия закрывается."""
+        self.size = size
+        self.idle = idle
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def configure(self, size, idle):
+        """Изменить размер пула и время простоя."""
+        with self.lock:
+            self.size = size
+            self.idle = idle
+            self.evict(time.monotonic())
+
+    def acquire(self, address):
+        """Взять сессию адреса из пула или создать новую."""
+        with self.lock:
+            self.evict(time.monotonic())
+            item = self.sessions.pop(address, None)
+        if item is not None:
+            return item[0]
+        # requests загружается только для движка опроса 'threads'.
+        import requests
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=1)
+        session.mount('http://', adapter)
+        return session
+
+    def release(self, address, session):
+        """Вернуть сессию в пул после успешного запроса."""
+        with self.lock:
+            if address in self.sessions or self.size <= 0:
+                session.close()
+                return
+            self.sessions[address] = (session, time.monotonic())
+            self.evict(time.monotonic())
+
+    def evict(self, now):
+        """Закрыть простаивающие и лишние сессии. Вызывать под lock."""
+        while self.sessions:
+            address, (session, used) = next(iter(self.sessions.items()))
+            if len(self.sessions) <= self.size and now - used < self.idle:
+                break
+            del self.sessions[address]
+            session.close()
+
+    def clear(self):
+        """Закрыть все сессии."""
+        with self.lock:
+            for session, used in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+
+# Пул сессий, общий для всех потоков ThreadGet.
+pool = SessionPool()
+
 
 class ThreadGet(QtCore.QThread):
-    """Поток отправки запроса."""
+    """Поток отправки запроса.
+
+    Последний аргумент сигналов запроса - его ключ (раунд опроса, адрес,
+    задержка)."""
     # Сигнал получения запроса
-    requestReceived = QtCore.pyqtSignal(list, str, str, datetime)
-    # Сигнал ошибки
-    requestFailed = QtCore.pyqtSignal(str, str, datetime)
+    requestReceived = QtCore.pyqtSignal(object, str, str, datetime, object)
+    # Сигнал ошибки (в том числе ответа с кодом, отличным от 200)
+    requestFailed = QtCore.pyqtSignal(str, str, datetime, object)
+    # Сигнал времени до получения заголовков и передачи тела ответа
+    requestTimed = QtCore.pyqtSignal(str, str, str, object)
+    # Сигнал задержки ответа с кодом 200 в секундах
+    requestLatency = QtCore.pyqtSignal(str, float)
+    # Сигнал завершения запроса
+    requestFinished = QtCore.pyqtSignal(str, object)
 
-    def __init__(self, address):
-        """Инициализация потока."""
+    def __init__(self, address, timeout=10, delay=0, round=0):
+        """Инициализация потока с адресом address, временем ожидания
+        соединения и ответа timeout секунд, задержкой запроса delay
+        секунд и номером раунда опроса round."""
         super().__init__()
         self.address = address
+        self.timeout = timeout
+        self.delay = delay
+        self.key = (round, address, delay)
 
     def run(self):
         """Основная функция потока."""
         try:
-            timeBegin = datetime.now()
-            request = requests.get(
-                'http://{0}'.format(self.address), timeout=(10, 10))
-            timeEnd = datetime.now()
-            delta = self.deltaTimeStr(timeBegin, timeEnd)
-            if request.status_code == 200:
-                if len(request.text) > 0:
-                    temp = request.text.split('\n')
-                    try:
-                        temp.remove('')
-                    except Exception:
-                        pass
-                    self.requestReceived.emit(
-                        temp, self.address, delta, timeBegin)
-            elif int(request.status_code / 100) == 1:
-                print("{0}: Informational".format(request.status_code))
-            elif int(request.status_code / 100) == 2:
-                print("{0}: Success".format(request.status_code))
-            elif int(request.status_code / 100) == 3:
-                print("{0}: Redirection ".format(request.status_code))
-            elif int(request.status_code / 100) == 4:
-                print("{0}: Client Error".format(request.status_code))
-            elif int(request.status_code / 100) == 5:
-                print("{0}: Server Error".format(request.status_code))
-
-        except requests.RequestException:
+            self.fetch()
+        finally:
+            self.requestFinished.emit(self.address, self.key)
+
+    def fetch(self):
+        """Отправить запрос и передать результат сигналами.
+
+        requests не сообщает время установки соединения, поэтому первая
+        часть времени запроса - время до получения заголовков ответа
+        (для новой сессии - вместе с соединением), вторая - время
+        передачи тела."""
+        import requests
+        if self.delay > 0:
+            time.sleep(self.delay)
+        session = pool.acquire(self.address)
+        timeBegin = datetime.now()
+        begin = time.monotonic()
+        try:
+            request = session.get(
+                'http://{0}'.format(self.address),
+                timeout=(self.timeout, self.timeout),
+                stream=True)
+            timeHeaders = datetime.now()
+            # Ответ разбирается по мере получения, без сборки всего текста.
+            parser = responseParser.Parser(request.encoding or 'latin-1')
+            for chunk in request.iter_content(chunk_size=8192):
+                parser.feed(chunk)
+            batch = parser.close()
             timeEnd = datetime.now()
-            delta = self.deltaTimeStr(timeBegin, timeEnd)
-            self.requestFailed.emit(self.address, delta, timeBegin)
+            latency = time.monotonic() - begin
+        except Exception as e:
+            # Сессия после любой ошибки в пул не возвращается.
+            session.close()
+            if not isinstance(e, requests.RequestException):
+                print(e)
+            delta = self.deltaTimeStr(timeBegin, datetime.now())
+            self.requestFailed.emit(
+                self.address, delta, timeBegin, self.key)
+            return
+        pool.release(self.address, session)
+        delta = self.deltaTimeStr(timeBegin, timeEnd)
+        if request.status_code == 200:
+            self.requestLatency.emit(self.address, latency)
+            self.requestTimed.emit(
+                self.address,
+                self.deltaTimeStr(timeBegin, timeHeaders),
+                self.deltaTimeStr(timeHeaders, timeEnd),
+                self.key)
+            if len(batch) or batch.malformed:
+                self.requestReceived.emit(
+                    batch, self.address, delta, timeBegin, self.key)
+        elif int(request.status_code / 100) == 1:
+            print("{0}: Informational".format(request.status_code))
+        elif int(request.status_code / 100) == 2:
+            print("{0}: Success".format(request.status_code))
+        elif int(request.status_code / 100) == 3:
+            print("{0}: Redirection ".format(request.status_code))
+        elif int(request.status_code / 100) == 4:
+            print("{0}: Client Error".format(request.status_code))
+        elif int(request.status_code / 100) == 5:
+            print("{0}: Server Error".format(request.status_code))
+        if request.status_code != 200:
+            # Ответ без показаний (ошибка модуля, перенаправление)
+            # считается неудачным запросом и учитывается в состоянии
+            # адреса; его задержка не учитывается.
+            self.requestFailed.emit(
+                self.address, delta, timeBegin, self.key)
 
     def deltaTimeStr(self, begin, end):
         """Вернуть строкой разницу во времени"""
         delta = end - begin
-        deltaStr = str(delta.total_seconds())
-        delimeter = deltaStr.find('.')
-        if delimeter < (len(deltaStr) - 2):
-            deltaStr = deltaStr[0:(delimeter + 2)]
-        return deltaStr
+        # Отбросить всё после первого знака после запятой, не допуская
+        # экспоненциальной записи малых значений.
+        return str(int(delta.total_seconds() * 10) / 10)
@@ -3,13 +3,12 @@
 # !/usr/bin/env python3
 
 import os
-from PyQt5 import QtCore
-from datetime import datetime
-from smtplib import SMTP_SSL
-from email.message import EmailMessage
-from email.mime.image import MIMEImage
-from email.mime.application import MIMEApplication
-from email.mime.multipart import MIMEMultipart
+from headless import QtCore
+from datetime import datetime, timedelta
+
+import dayFile
+import mailQueue
+import mailSchedule
 
 
 class EmailInfo:
@@ -33,23 +32,6 @@ class EmailInfo:
         self.mode = mode[0].upper() == 'C'
         self.times = tuple([split(time) for time in times])
 
-    def check(self, interval, now):
-        """Проверка времени отправки имейла на соответствие интервалу
-        в текущем времени."""
-        for tt in self.times:
-            min_time = datetime(now.year, now.month, now.day, tt[0], tt[1], 0)
-            max_time = datetime(
-                now.year,
-                now.month,
-                now.day,
-                tt[0] + int(int(tt[1] + interval / 60) / 60),
-                (tt[1] + int(interval / 60)) % 60,
-                interval % 60
-            )
-            if (now >= min_time) and (now < max_time):
-                return True
-        return False
-
     def __repr__(self):
         return self.__str__()
 
@@ -64,17 +46,29 @@ class ThreadMail(QtCore.QThread):
     mailReceived = QtCore.pyqtSignal(str, str)
     mailFailed = QtCore.pyqtSignal(str, datetime, str)
 
-    def __init__(self, path):
-        """Инициализация потока с указанием пути файла настрйоик имейлов."""
+    def __init__(self, path, pathQueue='config/mail'):
+        """Инициализация потока с указанием пути файла настрйоик имейлов
+        и папки очереди отправки."""
         super().__init__()
         self.config = path
         self.info_list = []
+        self.url = 'smtp.gmail.com'
+        self.port = 465
+        # Разрешить сеанс без шифрования (локальный ретранслятор).
+        self.plain = False
         self.configRead()
 
         if not self.username or not self.password:
             raise ValueError('Empty email username, password or address!')
-        self.url = 'smtp.gmail.com'
-        self.port = 465
+        # Количество попыток отправки письма одному получателю.
+        self.attempts = 3
+        self.server = None
+        self.unavailable = False
+        self.queue = mailQueue.MailQueue(pathQueue)
+        self.schedule = mailSchedule.MailSchedule(
+            '{}/schedule'.format(pathQueue))
+        self.schedule.build(self.info_list)
+        self.pathData = 'data'
 
     def configRead(self):
         """Считать настройки модуля Email."""
@@ -86,6 +80,14 @@ class ThreadMail(QtCore.QThread):
                     temp = line.split(';')
                     self.username = temp[0]
                     self.password = temp[1]
+                    # Необязательные адрес и порт сервера SMTP.
+                    if len(temp) > 2 and temp[2]:
+                        self.url = temp[2]
+                    if len(temp) > 3 and temp[3]:
+                        self.port = int(temp[3])
+                    # Необязательный флаг 'plain': сервер без STARTTLS.
+                    if len(temp) > 4:
+                        self.plain = temp[4].strip().lower() == 'plain'
 
                     for line in file:
                         line = line.replace('\n', '')
@@ -96,63 +98,171 @@ class ThreadMail(QtCore.QThread):
             except Exception as error:
                 print(error)
 
-    def set_path(self, pathData, currentDate, prevDate, interval):
-        """Задание текущей и предыдущей дат для отправки соответствующего 
-        графика."""
-        self.path = '{0}\\{1}\\{2}\\{3}'.format(
-            pathData,
-            currentDate.strftime('%Y'),
-            currentDate.strftime('%m'),
-            currentDate.strftime('%d'))
-        self.name = currentDate.strftime('%Y.%m.%d')
-        self.prevPath = '{0}\\{1}\\{2}\\{3}'.format(
-            pathData,
-            prevDate.strftime('%Y'),
-            prevDate.strftime('%m'),
-            prevDate.strftime('%d'))
-        self.prevName = prevDate.strftime('%Y.%m.%d')
-        self.interval = interval
+    def set_path(self, pathData):
+        """Задание папки данных с графиками суток."""
+        self.pathData = pathData
 
     def run(self):
-        """Основная функция потока."""
+        """Основная функция потока.
+
+        Отчёты, время отправки которых наступило, добавляются в очередь,
+        затем отправляются все ожидающие отчёты очереди. Все письма
+        отправляются за один сеанс SMTP, каждое вложение считывается
+        и кодируется один раз для всех получателей."""
         begin = datetime.now()
-        for info in self.info_list:
-            if info.check(self.interval, begin):
-                message = MIMEMultipart()
-                message['From'] = self.username
-                message['To'] = info.address
-                message['Subject'] = 'Мониторинг радара.'
-                try:
-                    if info.mode:
-                        path = self.path
-                        name = self.name
-                    else:
-                        path = self.prevPath
-                        name = self.prevName
-                    with open('{}\\{}.pdf'.format(path, name), 'rb') as file:
-                        img = file.read()
-                        # img = MIMEImage(img)
-                        img = MIMEApplication(img)
-                        img.add_header(
-                            'Content-Disposition',
-                            'attachment',
-                            filename='{}.pdf'.format(self.name))
-                        message.attach(img)
-                        with SMTP_SSL(self.url, self.port, timeout=10) as serv:
-                            serv.ehlo()
-                            serv.login(self.username, self.password)
-                            serv.send_message(message)
-                        end = datetime.now()
-                        self.mailReceived.emit(
-                            'Email sent.',
-                            self.deltaTimeStr(begin, end))
-                except Exception as e:
-                    print(e)
-                    end = datetime.now()
+        for info, fire in self.schedule.due(begin):
+            slot = fire.strftime('%H:%M')
+            if info.mode:
+                self.queue.add(
+                    info.address, fire.strftime('%Y.%m.%d'), 'C', slot)
+            else:
+                prev = fire - timedelta(days=1)
+                self.queue.add(
+                    info.address, prev.strftime('%Y.%m.%d'), 'P', slot)
+
+        attachments = {}
+        self.server = None
+        self.unavailable = False
+        try:
+            for key in self.queue.due():
+                # Сервер недоступен: остальные отчёты откладываются.
+                result = False
+                if not self.unavailable:
+                    result = self.send(key, attachments, begin)
+                if result:
+                    self.queue.delivered(key)
+                elif result is None:
+                    # Отказ окончательный: отчёт не отправляется повторно.
+                    self.queue.drop(key)
                     self.mailFailed.emit(
-                        'Email don`t sent!',
+                        'Email to {} is refused!'.format(key[0]),
                         begin,
-                        self.deltaTimeStr(begin, end))
+                        self.deltaTimeStr(begin, datetime.now()))
+                else:
+                    delay = self.queue.failed(key)
+                    if delay is None:
+                        self.mailFailed.emit(
+                            'Email to {} is dropped!'.format(key[0]),
+                            begin,
+                            self.deltaTimeStr(begin, datetime.now()))
+        finally:
+            self.disconnect()
+
+    def attachment(self, day, attachments):
+        """Вернуть вложение с графиком суток day, создав его один раз."""
+        # Модули почты загружаются при первой отправке.
+        from email.mime.application import MIMEApplication
+        if day not in attachments:
+            date = datetime.strptime(day, '%Y.%m.%d')
+            path = dayFile.path(self.pathData, date) + '.pdf'
+            with open(path, 'rb') as file:
+                img = MIMEApplication(file.read())
+            img.add_header(
+                'Content-Disposition',
+                'attachment',
+                filename='{}.pdf'.format(day))
+            attachments[day] = img
+        return attachments[day]
+
+    def send(self, key, attachments, begin):
+        """Отправить отчёт key = (адрес, сутки, режим, время отправки),
+        повторяя попытку при временной ошибке.
+
+        Возвращает True, если письмо отправлено, None, если сервер
+        окончательно отказал (код 5xx), иначе False."""
+        from email.mime.multipart import MIMEMultipart
+        from smtplib import SMTPRecipientsRefused, SMTPResponseException
+        try:
+            message = MIMEMultipart()
+            message['From'] = self.username
+            message['To'] = key[0]
+            message['Subject'] = 'Мониторинг радара.'
+            message.attach(self.attachment(key[1], attachments))
+            for attempt in range(self.attempts):
+                try:
+                    if self.server is None:
+                        self.connect()
+                    self.server.send_message(message)
+                    break
+                except OSError as e:
+                    if attempt + 1 == self.attempts or self.refused(e):
+                        raise
+                    print(e)
+                    # Сеанс продолжается, если сервер ответил отказом.
+                    if not isinstance(e, SMTPResponseException) and \
+                            not isinstance(e, SMTPRecipientsRefused):
+                        self.disconnect()
+            end = datetime.now()
+            self.mailReceived.emit(
+                'Email sent.',
+                self.deltaTimeStr(begin, end))
+            return True
+        except Exception as e:
+            print(e)
+            end = datetime.now()
+            self.mailFailed.emit(
+                'Email don`t sent!',
+                begin,
+                self.deltaTimeStr(begin, end))
+            if self.refused(e):
+                return None
+            return False
+
+    def refused(self, error):
+        """Проверить, что сервер в открытом сеансе окончательно отказал
+        в отправке письма (код 5xx). Ошибки соединения и входа
+        окончательными не считаются."""
+        from smtplib import SMTPRecipientsRefused, SMTPResponseException
+        if self.server is None:
+            return False
+        if isinstance(error, SMTPRecipientsRefused):
+            return all(
+                code >= 500 for code, text in error.recipients.values())
+        return isinstance(error, SMTPResponseException) and \
+            error.smtp_code >= 500
+
+    def connect(self):
+        """Открыть сеанс SMTP.
+
+        На порту 465 используется SSL, на других портах - STARTTLS;
+        сертификат сервера проверяется. Если сервер не поддерживает
+        STARTTLS, сеанс не открывается, пока в настройках не задан флаг
+        plain. Вход выполняется, только если сеанс зашифрован и сервер
+        предлагает AUTH; без шифрования имя и пароль не передаются."""
+        import ssl
+        from smtplib import SMTP, SMTP_SSL, SMTPNotSupportedError
+        self.unavailable = True
+        context = ssl.create_default_context()
+        secure = self.port == 465
+        if secure:
+            self.server = SMTP_SSL(
+                self.url, self.port, timeout=10, context=context)
+        else:
+            self.server = SMTP(self.url, self.port, timeout=10)
+        try:
+            self.server.ehlo()
+            if not secure and self.server.has_extn('starttls'):
+                self.server.starttls(context=context)
+                self.server.ehlo()
+                secure = True
+            if not secure and not self.plain:
+                raise SMTPNotSupportedError(
+                    'STARTTLS is not supported by {}'.format(self.url))
+            if secure and self.server.has_extn('auth'):
+                self.server.login(self.username, self.password)
+        except Exception:
+            self.disconnect()
+            raise
+        self.unavailable = False
+
+    def disconnect(self):
+        """Закрыть сеанс SMTP."""
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                self.server.close()
+            self.server = None
 
     def deltaTimeStr(self, begin, end):
         """Вернуть строкой разницу во времени"""
@@ -0,0 +1,245 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+import asyncio
+import time
+from headless import QtCore
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import responseParser
+
+
+class ThreadPoll(QtCore.QThread):
+    """Поток опроса модулей в одном цикле событий asyncio.
+
+    Соединения с модулями остаются открытыми между опросами (keep-alive),
+    количество одновременных запросов ограничено. Последний аргумент
+    сигналов запроса - его ключ (раунд опроса, адрес, задержка)."""
+    # Сигнал получения запроса
+    requestReceived = QtCore.pyqtSignal(object, str, str, datetime, object)
+    # Сигнал ошибки (в том числе ответа с кодом, отличным от 200)
+    requestFailed = QtCore.pyqtSignal(str, str, datetime, object)
+    # Сигнал времени до получения заголовков и передачи тела ответа
+    requestTimed = QtCore.pyqtSignal(str, str, str, object)
+    # Сигнал задержки ответа с кодом 200 в секундах
+    requestLatency = QtCore.pyqtSignal(str, float)
+    # Сигнал завершения одного запроса
+    requestFinished = QtCore.pyqtSignal(str, object)
+
+    def __init__(self, limit=64, timeout=10):
+        """Инициализация потока.
+
+        limit - максимальное количество одновременных запросов;
+
+        timeout - время ожидания соединения и ответа в секундах
+        по умолчанию."""
+        super().__init__()
+        self.limit = limit
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = None
+        # Лимит, с которым создан семафор.
+        self.size = None
+        self.connections = {}
+
+    def run(self):
+        """Основная функция потока: цикл событий до вызова stop."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        # Отменить запросы, ожидающие своего времени.
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(
+            asyncio.gather(*tasks, return_exceptions=True))
+        for reader, writer in self.connections.values():
+            writer.close()
+        self.connections.clear()
+
+    def poll(self, plan, timeouts=None, round=0):
+        """Поставить запросы в очередь опроса. Вызывается из любого потока.
+
+        plan - список (адрес, задержка запроса в секундах);
+
+        timeouts - словарь времени ожидания по адресам;
+
+        round - номер раунда опроса для ключей запросов."""
+        if not self.isRunning():
+            self.start()
+        if timeouts is None:
+            timeouts = {}
+        for address, delay in plan:
+            asyncio.run_coroutine_threadsafe(
+                self.get(
+                    address, timeouts.get(address, self.timeout), delay,
+                    (round, address, delay)),
+                self.loop)
+
+    def stop(self):
+        """Остановить цикл событий и закрыть соединения."""
+        if self.isRunning():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.wait()
+
+    async def get(self, address, timeout, delay=0, key=None):
+        """Через delay секунд отправить запрос модулю и передать результат
+        сигналами с ключом запроса key."""
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.size != self.limit:
+                # Лимит изменён: новые запросы ограничиваются новым
+                # семафором, начатые освобождают прежний.
+                self.size = self.limit
+                self.semaphore = asyncio.Semaphore(self.size)
+            async with self.semaphore:
+                await self.request(address, timeout, key)
+        finally:
+            self.requestFinished.emit(address, key)
+
+    async def request(self, address, timeout, key):
+        """Отправить запрос модулю и передать результат сигналами."""
+        timeBegin = datetime.now()
+        begin = time.monotonic()
+        try:
+            status, batch, timeHeaders = await self.fetch(address, timeout)
+            timeEnd = datetime.now()
+            latency = time.monotonic() - begin
+            delta = self.deltaTimeStr(timeBegin, timeEnd)
+            if status == 200:
+                self.requestLatency.emit(address, latency)
+                self.requestTimed.emit(
+                    address,
+                    self.deltaTimeStr(timeBegin, timeHeaders),
+                    self.deltaTimeStr(timeHeaders, timeEnd),
+                    key)
+                if len(batch) or batch.malformed:
+                    self.requestReceived.emit(
+                        batch, address, delta, timeBegin, key)
+            else:
+                print('{0}: {1}'.format(address, status))
+                # Как и в ThreadGet, ответ с другим кодом - ошибка запроса.
+                self.requestFailed.emit(address, delta, timeBegin, key)
+        except (OSError, ValueError, LookupError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError):
+            timeEnd = datetime.now()
+            delta = self.deltaTimeStr(timeBegin, timeEnd)
+            self.requestFailed.emit(address, delta, timeBegin, key)
+
+    async def fetch(self, address, timeout):
+        """Выполнить GET-запрос, по возможности через открытое соединение.
+
+        Возвращает код ответа, разобранные показания (responseParser.Batch)
+        и время получения заголовков."""
+        url = urlsplit('http://{}'.format(address))
+        path = url.path or '/'
+        if url.query:
+            path += '?' + url.query
+        request = (
+            'GET {} HTTP/1.1\r\n'
+            'Host: {}\r\n'
+            'Connection: keep-alive\r\n\r\n'
+        ).format(path, url.netloc).encode('ascii')
+
+        connection = self.connections.pop(address, None)
+        if connection is not None:
+            # Модуль мог закрыть простаивающее соединение:
+            # повторить запрос через новое.
+            try:
+                return await self.exchange(
+                    address, connection, request, timeout)
+            except (OSError, asyncio.IncompleteReadError):
+                connection[1].close()
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(url.hostname, url.port or 80),
+            timeout)
+        return await self.exchange(address, connection, request, timeout)
+
+    async def exchange(self, address, connection, request, timeout):
+        """Отправить запрос через соединение и прочитать ответ."""
+        reader, writer = connection
+        try:
+            writer.write(request)
+            await writer.drain()
+            response = await asyncio.wait_for(
+                self.readResponse(reader), timeout)
+            status, keep, batch, timeHeaders = response
+        except BaseException:
+            writer.close()
+            raise
+        if keep and address not in self.connections:
+            self.connections[address] = connection
+        else:
+            writer.close()
+        return status, batch, timeHeaders
+
+    async def readResponse(self, reader, size=65536):
+        """Прочитать ответ HTTP/1.x, разбирая тело частями не больше size
+        байт по мере получения.
+
+        Возвращает код, признак keep-alive, разобранные показания
+        и время получения заголовков."""
+        line = await reader.readline()
+        if not line:
+            raise ConnectionResetError('Connection closed')
+        temp = line.decode('latin-1').split(None, 2)
+        if len(temp) < 2 or not temp[0].startswith('HTTP/'):
+            raise ValueError('Bad status line')
+        version = temp[0]
+        status = int(temp[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        timeHeaders = datetime.now()
+
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            keep = connection == 'keep-alive'
+        else:
+            keep = connection != 'close'
+
+        charset = 'latin-1'
+        for item in headers.get('content-type', '').split(';')[1:]:
+            key, _, value = item.strip().partition('=')
+            if key.lower() == 'charset':
+                charset = value.strip('"')
+        parser = responseParser.Parser(charset)
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            while True:
+                length = int((await reader.readline()).split(b';')[0], 16)
+                if length == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n',
+                                                            b''):
+                        pass
+                    break
+                parser.feed(await reader.readexactly(length))
+                await reader.readline()
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            while length > 0:
+                data = await reader.readexactly(min(length, size))
+                parser.feed(data)
+                length -= len(data)
+        else:
+            while True:
+                data = await reader.read(size)
+                if not data:
+                    break
+                parser.feed(data)
+            keep = False
+        return status, keep, parser.close(), timeHeaders
+
+    def deltaTimeStr(self, begin, end):
+        """Вернуть строкой разницу во времени"""
+        delta = end - begin
+        # Отбросить всё после первого знака после запятой, не допуская
+        # экспоненциальной записи малых значений.
+        return str(int(delta.total_seconds() * 10) / 10)
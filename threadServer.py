@@ -2,43 +2,156 @@
 
 # !/usr/bin/env python3
 
-from PyQt5 import QtCore
-import requests
+from headless import QtCore
+from collections import deque
 from datetime import datetime
-import psutil
+import threading
+import time
+
+import responseParser
 
 
 class ThreadServer(QtCore.QThread):
-    """Поток получения информации о ресурсах компьютера."""
+    """Поток получения информации о ресурсах компьютера.
+
+    Ресурсы измеряются с постоянным интервалом, последние измерения
+    хранятся в кольцевом буфере, на запрос сразу отправляются средние
+    значения по буферу.
+
+    Коды датчиков:
+
+    4301 - загрузка процессора, %;
+
+    4401, 4402, ... - загрузка отдельных ядер процессора, %;
+
+    4801 - заполнение диска, %;
+
+    4901, 4902 - скорость чтения и записи диска, КБ/с;
+
+    5201 - использование памяти, %;
+
+    5301, 5302 - скорость приёма и передачи по сети, КБ/с.
+
+    Последний аргумент сигналов - ключ запроса (раунд опроса, адрес, 0)."""
     # Сигнал получения запроса
-    requestReceived = QtCore.pyqtSignal(list, str, str, datetime)
+    requestReceived = QtCore.pyqtSignal(object, str, str, datetime, object)
     # Сигнал ошибки
-    requestFailed = QtCore.pyqtSignal(str, str, datetime)
+    requestFailed = QtCore.pyqtSignal(str, str, datetime, object)
+    # Сигнал завершения одного запроса
+    requestFinished = QtCore.pyqtSignal(str, object)
+
+    def __init__(self, interval=1, size=60):
+        """Инициализация потока.
+
+        interval - интервал измерений в секундах;
 
-    def __init__(self):
-        """Инициализация потока."""
+        size - количество хранимых измерений."""
         super().__init__()
         self.address = 'localhost'
+        self.interval = interval
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.requests = []
 
     def run(self):
-        """Основная функция потока."""
-        try:
-            timeBegin = datetime.now()
+        """Основная функция потока: периодические измерения."""
+        # psutil загружается при первом запуске измерений.
+        import psutil
+        self.stopped.clear()
+        psutil.cpu_percent(None)
+        psutil.cpu_percent(None, percpu=True)
+        disk = psutil.disk_io_counters()
+        net = psutil.net_io_counters()
+        last = time.monotonic()
+        while not self.stopped.wait(
+                max(0, last + self.interval - time.monotonic())):
+            now = time.monotonic()
+            elapsed = now - last
+            last = now
+            try:
+                diskNew = psutil.disk_io_counters()
+                netNew = psutil.net_io_counters()
+                sample = [
+                    ('4301', psutil.cpu_percent(None)),
+                    ('4801', psutil.disk_usage('/').percent),
+                    ('5201', psutil.virtual_memory().percent),
+                ]
+                for i, cpu in enumerate(psutil.cpu_percent(None, True)):
+                    sample.append((str(4401 + i), cpu))
+                if disk is not None and diskNew is not None:
+                    sample.append((
+                        '4901',
+                        (diskNew.read_bytes - disk.read_bytes) /
+                        1024 / elapsed))
+                    sample.append((
+                        '4902',
+                        (diskNew.write_bytes - disk.write_bytes) /
+                        1024 / elapsed))
+                if net is not None and netNew is not None:
+                    sample.append((
+                        '5301',
+                        (netNew.bytes_recv - net.bytes_recv) / 1024 / elapsed))
+                    sample.append((
+                        '5302',
+                        (netNew.bytes_sent - net.bytes_sent) / 1024 / elapsed))
+                disk = diskNew
+                net = netNew
+            except Exception as e:
+                print(e)
+                continue
+            with self.lock:
+                self.samples.append(sample)
+                requests = self.requests
+                self.requests = []
+            for timeBegin, key in requests:
+                self.answer(timeBegin, key)
+
+    def poll(self, round=0):
+        """Отправить средние значения ресурсов сигналом requestReceived;
+        round - номер раунда опроса.
 
-            cpu = psutil.cpu_percent(10)
-            disk = psutil.disk_usage('/').percent
-            mem = psutil.virtual_memory().percent
-            temp = ['4301 {}'.format(cpu),
-                    '4801 {}'.format(disk),
-                    '5201 {}'.format(mem)]
+        Если измерений ещё нет, ответ отправляется после первого
+        измерения."""
+        timeBegin = datetime.now()
+        key = (round, self.address, 0)
+        if not self.isRunning():
+            self.start()
+        with self.lock:
+            if not self.samples:
+                self.requests.append((timeBegin, key))
+                return
+        self.answer(timeBegin, key)
 
+    def answer(self, timeBegin, key):
+        """Отправить средние значения по буферу измерений."""
+        try:
+            with self.lock:
+                samples = list(self.samples)
+            sums = {}
+            counts = {}
+            for sample in samples:
+                for code, value in sample:
+                    sums[code] = sums.get(code, 0) + value
+                    counts[code] = counts.get(code, 0) + 1
+            batch = responseParser.Batch()
+            for code in sums:
+                value = round(sums[code] / counts[code], 1)
+                batch.append(code, '{:.1f}'.format(value), value)
             timeEnd = datetime.now()
             delta = self.deltaTimeStr(timeBegin, timeEnd)
-            self.requestReceived.emit(temp, self.address, delta, timeBegin)
-        except requests.RequestException:
+            self.requestReceived.emit(
+                batch, self.address, delta, timeBegin, key)
+        except Exception:
             timeEnd = datetime.now()
             delta = self.deltaTimeStr(timeBegin, timeEnd)
-            self.requestFailed.emit(self.address, delta, timeBegin)
+            self.requestFailed.emit(self.address, delta, timeBegin, key)
+        self.requestFinished.emit(self.address, key)
+
+    def stop(self):
+        """Остановить измерения."""
+        self.stopped.set()
+        self.wait()
 
     def deltaTimeStr(self, begin, end):
         """Вернуть строкой разницу во времени"""
@@ -0,0 +1,161 @@
+# Copyright © 2018 Stanislav Hnatiuk.  All rights reserved.
+
+# !/usr/bin/env python3
+
+from headless import QtCore
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+
+import sensorConfig
+
+# Флаги inotify (linux/inotify.h).
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+        IN_CREATE | IN_DELETE)
+
+
+def inotify(paths):
+    """Создать дескриптор inotify, наблюдающий за папками paths.
+
+    Возвращает None, если inotify недоступен (не Linux, ошибка libc)."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for path in paths:
+        if libc.inotify_add_watch(fd, os.fsencode(path), MASK) < 0:
+            os.close(fd)
+            return None
+    return fd
+
+
+class ThreadWatch(QtCore.QThread):
+    """Поток наблюдения за файлами адресов и датчиков.
+
+    На Linux поток ждёт событий inotify, иначе (и если inotify
+    недоступен) проверяет время изменения файлов каждые interval
+    секунд. Изменённые файлы разбираются в потоке, результат передаётся
+    сигналом changed: (адрес -> имя, адрес -> период) или None,
+    sensorConfig.SensorConfig или None."""
+    changed = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, interval=2, delay=0.5):
+        """Инициализация потока.
+
+        interval - период проверки файлов без inotify в секундах;
+
+        delay - время ожидания после события, за которое собираются
+        остальные события одного сохранения файла."""
+        super().__init__()
+        self.interval = interval
+        self.delay = delay
+        self.pathAddresses = None
+        self.pathSensors = None
+        self.stampAddresses = None
+        self.config = None
+        self.stopping = threading.Event()
+
+    def watch(self, pathAddresses, pathSensors):
+        """Начать наблюдение за файлом адресов и папкой датчиков.
+
+        Файлы, только что считанные вызывающим, считаются известными:
+        сигнал changed отправляется только после их изменения."""
+        self.stop()
+        self.pathAddresses = pathAddresses
+        self.pathSensors = pathSensors
+        self.stampAddresses = None
+        self.config = None
+        try:
+            self.stampAddresses = self.stamp()
+        except OSError:
+            pass
+        try:
+            self.config = sensorConfig.load(pathSensors)
+        except OSError:
+            pass
+        self.stopping.clear()
+        self.start()
+
+    def stop(self):
+        """Остановить наблюдение."""
+        if self.isRunning():
+            self.stopping.set()
+            self.wait()
+
+    def run(self):
+        """Основная функция потока."""
+        self.check()
+        paths = {
+            os.path.dirname(os.path.abspath(self.pathAddresses)),
+            os.path.abspath(self.pathSensors)
+        }
+        fd = inotify(paths)
+        try:
+            while not self.stopping.is_set():
+                if fd is None:
+                    self.stopping.wait(self.interval)
+                elif not self.read(fd, 1):
+                    continue
+                else:
+                    # Собрать события одного сохранения.
+                    while self.read(fd, self.delay):
+                        pass
+                if not self.stopping.is_set():
+                    self.check()
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def read(self, fd, timeout):
+        """Дождаться событий inotify не дольше timeout секунд и прочитать
+        их. Возвращает True, если события были."""
+        ready, _, _ = select.select([fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def stamp(self):
+        """Время изменения и размер файла адресов."""
+        stat = os.stat(self.pathAddresses)
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Разобрать изменившиеся файлы и отправить сигнал changed."""
+        addresses = None
+        config = None
+        try:
+            stamp = self.stamp()
+            if stamp != self.stampAddresses:
+                addresses = sensorConfig.readAddresses(self.pathAddresses)
+                self.stampAddresses = stamp
+        except (OSError, ValueError):
+            pass
+        try:
+            temp = sensorConfig.load(self.pathSensors)
+            if temp is not self.config:
+                config = self.config = temp
+        except (OSError, ValueError):
+            pass
+        if addresses is not None or config is not None:
+            self.changed.emit(addresses, config)